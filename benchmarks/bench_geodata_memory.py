@@ -0,0 +1,81 @@
+"""
+Memory used by Geodata objects.
+
+Compares the lazy Geodata (nothing parsed until it's used) against the same objects after every sub-object
+(geometry, anchor, baseTypeProperties, properties, displaySetting) has been touched, which is what the old eager
+constructor paid up front for every item.
+
+run from the repository root:
+    python -m benchmarks.bench_geodata_memory
+    python -m benchmarks.bench_geodata_memory --locations 100000
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from mapsindoors.geodata import Geodata
+from mapsindoors.synthetic import generate_solution
+
+
+def touch(location):
+    location.geometry
+    location.baseTypeProperties
+    location.properties
+    try:
+        location.anchor
+    except AttributeError:
+        pass
+    try:
+        location.displaySetting
+    except AttributeError:
+        pass
+
+
+def build(items, touch_all):
+    objects = [Geodata(item) for item in items]
+    if touch_all:
+        for location in objects:
+            touch(location)
+    return objects
+
+
+def measure(items, touch_all):
+    """returns (bytes, seconds). the timing run is done without tracemalloc since tracing slows allocation down a lot"""
+    gc.collect()
+    start = time.perf_counter()
+    objects = build(items, touch_all)
+    seconds = time.perf_counter() - start
+    del objects
+    gc.collect()
+    tracemalloc.start()
+    objects = build(items, touch_all)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--locations', type=int, default=100000)
+    args = parser.parse_args()
+
+    items = generate_solution(args.locations)['geodata']
+    per = 100000 / len(items)
+    lazy_bytes, lazy_seconds = measure(items, touch_all=False)
+    full_bytes, full_seconds = measure(items, touch_all=True)
+    results = {
+        'objects': len(items),
+        'lazy_bytes_per_100k': round(lazy_bytes * per),
+        'parsed_bytes_per_100k': round(full_bytes * per),
+        'saved_bytes_per_100k': round((full_bytes - lazy_bytes) * per),
+        'lazy_seconds_per_100k': round(lazy_seconds * per, 4),
+        'parsed_seconds_per_100k': round(full_seconds * per, 4),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Construction and query times of GeoFunctions over synthetic solutions (mapsindoors.synthetic) of growing size.
+
+For every size the solution is generated, GeoFunctions.from_data builds the indexes, and each query is called --queries
+times with ids picked at random from the solution:
+- get_location, get_location_venue_id: any location. get_distance: any location with an anchor
+- get_child_objects: floors, buildings and venues
+- get_areas_within_radius: rooms, areas and pois, --radius meters around them. the first call for a floor builds its
+  polygon index, first_call_us shows that cost separately from the steady state
+
+Every query reports calls, ops_per_second and p50/p95/max microseconds per call. The results are printed as json and
+written to --output when it's given, so runs from different commits can be compared.
+
+run from the repository root:
+    python -m benchmarks.bench_geofunctions
+    python -m benchmarks.bench_geofunctions --sizes 1000 10000 100000 1000000 --output geofunctions.json
+
+1M locations need several GB of memory and take minutes to generate and index.
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import time
+
+from mapsindoors.geo_functions import GeoFunctions
+from mapsindoors.synthetic import generate_solution
+
+
+SIZES = (1000, 10000, 100000)
+API_KEY = 'benchmark'
+
+
+def solution_shape(locations):
+    """venues, buildings and floors for a solution of this size, so floors hold a few hundred to a few thousand locations"""
+    venues = max(1, round(locations / 100000))
+    buildings_per_venue = 2 if locations < 10000 else 4
+    floors_per_building = 4 if locations < 100000 else 8
+    return {'venues': venues, 'buildings_per_venue': buildings_per_venue, 'floors_per_building': floors_per_building}
+
+
+def time_calls(function, arguments):
+    """calls function(*argument) for every argument and summarizes the time per call"""
+    durations = []
+    for argument in arguments:
+        start = time.perf_counter_ns()
+        function(*argument)
+        durations.append((time.perf_counter_ns() - start) / 1000)
+    return summarize(durations)
+
+
+def summarize(durations):
+    ordered = sorted(durations)
+    total_seconds = sum(durations) / 1e6
+    return {
+        'calls': len(durations),
+        'ops_per_second': round(len(durations) / total_seconds) if total_seconds else None,
+        'p50_us': round(statistics.median(ordered), 2),
+        'p95_us': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        'max_us': round(ordered[-1], 2),
+    }
+
+
+def run(locations, queries, radius, seed):
+    rng = random.Random(seed)
+    shape = solution_shape(locations)
+    start = time.perf_counter()
+    solution = generate_solution(locations, seed=seed, **shape)
+    generate_seconds = time.perf_counter() - start
+    geodata = solution['geodata']
+
+    gc.collect()
+    start = time.perf_counter()
+    geo_functions = GeoFunctions.from_data(API_KEY, geodata, solution['displaytypes'], solution['categories'], solution['appUserRoles'])
+    construction_seconds = time.perf_counter() - start
+
+    ids = [item['id'] for item in geodata]
+    containers = [item['id'] for item in geodata if item['baseType'] in ('floor', 'building', 'venue')]
+    places = [item['id'] for item in geodata if item['baseType'] in ('room', 'area', 'poi')]
+    # floors have no anchor to measure from
+    anchored = [item['id'] for item in geodata if 'anchor' in item]
+    location_ids = [(rng.choice(ids),) for _ in range(queries)]
+    pairs = [(rng.choice(anchored), rng.choice(anchored)) for _ in range(queries)]
+    container_ids = [(rng.choice(containers),) for _ in range(queries)]
+    radius_ids = [(rng.choice(places), radius) for _ in range(queries)]
+
+    # the first radius query for a floor builds that floor's polygon index. one call per floor pays it before timing
+    first_by_parent = {}
+    for location_id, _ in radius_ids:
+        first_by_parent.setdefault(geo_functions.get_location(location_id).parentId, location_id)
+    cold = []
+    for location_id in first_by_parent.values():
+        start = time.perf_counter_ns()
+        geo_functions.get_areas_within_radius(location_id, radius)
+        cold.append((time.perf_counter_ns() - start) / 1000)
+
+    results = {
+        'locations': locations,
+        'items': len(geodata),
+        **shape,
+        'generate_seconds': round(generate_seconds, 3),
+        'construction_seconds': round(construction_seconds, 3),
+        'get_location': time_calls(geo_functions.get_location, location_ids),
+        'get_child_objects': time_calls(geo_functions.get_child_objects, container_ids),
+        'get_location_venue_id': time_calls(geo_functions.get_location_venue_id, location_ids),
+        'get_distance': time_calls(geo_functions.get_distance, pairs),
+        'get_areas_within_radius': {**time_calls(geo_functions.get_areas_within_radius, radius_ids),
+                                    'first_call_us': round(statistics.mean(cold), 2)},
+    }
+    del geo_functions, solution, geodata
+    gc.collect()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='numbers of locations')
+    parser.add_argument('--queries', type=int, default=2000, help='calls per query and size')
+    parser.add_argument('--radius', type=float, default=10, help='meters, for get_areas_within_radius')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the results to this json file')
+    args = parser.parse_args()
+
+    results = {
+        'python': platform.python_version(),
+        'queries': args.queries,
+        'radius_meters': args.radius,
+        'sizes': [run(locations, args.queries, args.radius, args.seed) for locations in args.sizes],
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Throughput, probe lengths and memory of the Robin Hood HashMap against the built-in dict, keyed by 24 character hex ids
+like the ones MapsIndoors uses for locations.
+
+Workloads:
+- build: set() one key at a time, HashMap.from_items, and a dict
+- get_hit / get_miss: every stored key in random order, and as many ids that aren't in the map
+- mixed: 80% get (a quarter of them misses), 10% set of new keys, 10% delete
+- load_sweep: a fixed size table filled to each load factor, with hit and miss lookups and the probe-length histogram
+
+ops_per_second is the mean over --repeat runs, memory is what tracemalloc sees for the map itself (the keys and values
+are created before it is measured). --output saves the results as json so runs from different commits can be compared.
+
+run from the repository root:
+    python -m benchmarks.bench_hashmap
+    python -m benchmarks.bench_hashmap --keys 1000000 --output hashmap.json
+"""
+import argparse
+import gc
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from collections import Counter
+
+from mapsindoors.robin_hood_hash import HashMap
+
+
+LOAD_FACTORS = (0.5, 0.7, 0.85, 0.95)
+
+
+def hex_ids(rng, count):
+    return ['%024x' % rng.getrandbits(96) for _ in range(count)]
+
+
+def timed(function, operations, repeat):
+    """runs function repeat times. returns ops/sec of the mean run"""
+    seconds = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+    return round(operations / statistics.mean(seconds))
+
+
+def allocated(build):
+    """bytes held by what build() returns, measured without timing it"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def probe_stats(hash_map):
+    lengths = hash_map.probe_lengths
+    histogram = Counter(lengths)
+    return {'mean_probe_length': round(statistics.mean(lengths), 3) if lengths else 0, 'max_probe_length': max(lengths, default=0),
+            'probe_histogram': {str(length): histogram[length] for length in sorted(histogram)}}
+
+
+def set_loop(pairs):
+    hash_map = HashMap()
+    for key, value in pairs:
+        hash_map.set(key, value)
+    return hash_map
+
+
+def get_all(container, keys):
+    get = container.get
+    for key in keys:
+        get(key)
+
+
+def mixed_operations(rng, keys, misses, count):
+    """(operation, key) pairs for the mixed workload. deletes and sets only use keys the other ones don't, so every
+    operation does the same thing for the dict and the HashMap no matter in which order they ran"""
+    operations = []
+    deletable = iter(keys[len(keys) // 2:])
+    new_keys = iter(hex_ids(rng, count))
+    for _ in range(count):
+        draw = rng.random()
+        if draw < 0.6:
+            operations.append(('get', keys[rng.randrange(len(keys) // 2)]))
+        elif draw < 0.8:
+            operations.append(('get', rng.choice(misses)))
+        elif draw < 0.9:
+            operations.append(('set', next(new_keys)))
+        else:
+            key = next(deletable, None)
+            # once every deletable key is gone the rest of the deletes become lookups
+            operations.append(('get', keys[0]) if key is None else ('delete', key))
+    return operations
+
+
+def run_mixed_hashmap(keys, operations):
+    hash_map = HashMap.from_items(zip(keys, range(len(keys))))
+    start = time.perf_counter()
+    for operation, key in operations:
+        if operation == 'get':
+            hash_map.get(key)
+        elif operation == 'set':
+            hash_map.set(key, 0)
+        else:
+            hash_map.delete(key)
+    return time.perf_counter() - start
+
+
+def run_mixed_dict(keys, operations):
+    dictionary = dict(zip(keys, range(len(keys))))
+    start = time.perf_counter()
+    for operation, key in operations:
+        if operation == 'get':
+            dictionary.get(key)
+        elif operation == 'set':
+            dictionary[key] = 0
+        else:
+            dictionary.pop(key, None)
+    return time.perf_counter() - start
+
+
+def load_sweep(rng, count, repeat):
+    size = 1
+    while size < count:
+        size *= 2
+    keys = hex_ids(rng, size)
+    misses = hex_ids(rng, count)
+    results = []
+    for load_factor in LOAD_FACTORS:
+        filled = keys[:int(size * load_factor)]
+        hash_map = HashMap(size, max_load=0.99)
+        for value, key in enumerate(filled):
+            hash_map.set(key, value)
+        lookups = rng.sample(filled, min(count, len(filled)))
+        results.append({
+            'load_factor': round(hash_map.load(), 3),
+            'slots': hash_map.size,
+            'get_hit_ops_per_second': timed(lambda: get_all(hash_map, lookups), len(lookups), repeat),
+            'get_miss_ops_per_second': timed(lambda: get_all(hash_map, misses), len(misses), repeat),
+            **probe_stats(hash_map),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keys', type=int, default=100000)
+    parser.add_argument('--operations', type=int, default=200000, help='operations in the mixed workload')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='also write the results to this json file')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    keys = hex_ids(rng, args.keys)
+    misses = hex_ids(rng, args.keys)
+    pairs = list(zip(keys, range(len(keys))))
+    lookups = keys[:]
+    rng.shuffle(lookups)
+    hash_map = HashMap.from_items(pairs)
+    dictionary = dict(pairs)
+
+    results = {
+        'keys': args.keys,
+        'repeat': args.repeat,
+        'build': {
+            'hashmap_set_ops_per_second': timed(lambda: set_loop(pairs), len(keys), args.repeat),
+            'hashmap_from_items_ops_per_second': timed(lambda: HashMap.from_items(pairs), len(keys), args.repeat),
+            'dict_ops_per_second': timed(lambda: dict(pairs), len(keys), args.repeat),
+        },
+        'get_hit': {
+            'hashmap_ops_per_second': timed(lambda: get_all(hash_map, lookups), len(lookups), args.repeat),
+            'dict_ops_per_second': timed(lambda: get_all(dictionary, lookups), len(lookups), args.repeat),
+        },
+        'get_miss': {
+            'hashmap_ops_per_second': timed(lambda: get_all(hash_map, misses), len(misses), args.repeat),
+            'dict_ops_per_second': timed(lambda: get_all(dictionary, misses), len(misses), args.repeat),
+        },
+    }
+
+    operations = mixed_operations(rng, keys, misses, args.operations)
+    hashmap_seconds = statistics.mean(run_mixed_hashmap(keys, operations) for _ in range(args.repeat))
+    dict_seconds = statistics.mean(run_mixed_dict(keys, operations) for _ in range(args.repeat))
+    results['mixed'] = {
+        'operations': dict(Counter(operation for operation, _ in operations)),
+        'hashmap_ops_per_second': round(len(operations) / hashmap_seconds),
+        'dict_ops_per_second': round(len(operations) / dict_seconds),
+    }
+
+    results['memory'] = {
+        'hashmap_bytes': allocated(lambda: HashMap.from_items(pairs)),
+        'hashmap_set_bytes': allocated(lambda: set_loop(pairs)),
+        'dict_bytes': allocated(lambda: dict(pairs)),
+    }
+    results['probes'] = {'load_factor': round(hash_map.load(), 3), 'slots': hash_map.size, **probe_stats(hash_map)}
+    results['load_sweep'] = load_sweep(rng, min(args.keys, 1 << 17), args.repeat)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
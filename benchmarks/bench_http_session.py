@@ -0,0 +1,71 @@
+"""
+Per-call HTTP cost of ApiInstance against a local stand-in server: a new connection per request (plain requests.request,
+which is what ApiInstance used to do) compared with the pooled keep-alive session, sequentially and from several threads.
+
+run from the repository root:
+    python -m benchmarks.bench_http_session
+    python -m benchmarks.bench_http_session --requests 500 --threads 8
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from mapsindoors.fake_server import FakeIntegrationServer
+from mapsindoors.http_session import create_session
+from mapsindoors.integration_api_instance import ApiInstance
+from mapsindoors.rate_limit import ApiScheduler
+
+
+API_KEY = 'benchmark'
+
+
+class UnpooledApiInstance(ApiInstance):
+    """ApiInstance as it was before sessions: every call goes through requests.request and opens a new connection"""
+    def get_location_types(self):
+        return requests.request('GET', url=self.url.display_types_url(), headers={'Accept': 'application/json'}).json()
+
+
+def run(instance, count, threads):
+    start = time.perf_counter()
+    if threads == 1:
+        for _ in range(count):
+            instance.get_location_types()
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(lambda _: instance.get_location_types(), range(count)))
+    seconds = time.perf_counter() - start
+    return {'requests': count, 'threads': threads, 'seconds': round(seconds, 4), 'requests_per_second': round(count / seconds, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    server = FakeIntegrationServer().start()
+    # this measures the connection cost, so the requests aren't paced
+    unpaced = ApiScheduler(rate=1e9, burst=1e9, initial_concurrency=args.threads, max_concurrency=args.threads)
+    instances = {
+        'unpooled': UnpooledApiInstance(API_KEY, integration_url=server.url),
+        'pooled_session': ApiInstance(API_KEY, session=create_session(pool_maxsize=args.threads), scheduler=unpaced,
+                                      integration_url=server.url),
+    }
+    results = {}
+    for name, instance in instances.items():
+        results[name] = [run(instance, args.requests, 1), run(instance, args.requests, args.threads)]
+
+    # bytes on the wire for the geodata response with and without compression
+    geodata_url = instances['pooled_session'].url.geodata_url()
+    plain = requests.get(geodata_url, headers={'Accept-Encoding': 'identity'}, stream=True)
+    compressed = requests.get(geodata_url, headers={'Accept-Encoding': 'gzip'}, stream=True)
+    results['geodata_bytes'] = {'identity': int(plain.headers['Content-Length']), 'gzip': int(compressed.headers['Content-Length'])}
+    server.stop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import time
+import aiohttp
+from mapsindoors.url_classes import *
+from mapsindoors.geodata_stream import *
+from mapsindoors.rate_limit import *
+from mapsindoors.instrumentation import *
+
+
+#total timeout in seconds for one request. the geodata of a big solution can take a while.
+DEFAULT_ASYNC_TIMEOUT = 120
+
+
+def create_async_session(limit:int=100, limit_per_host:int=32, timeout:float=DEFAULT_ASYNC_TIMEOUT):
+    """
+    Creates an aiohttp.ClientSession with a bounded keep-alive connection pool that asks for compressed responses.
+    Has to be called from inside a running event loop. Close it with `await session.close()` (or use `async with`).
+
+    Parameters
+    ----------
+    limit --> max open connections in total
+    limit_per_host --> max open connections to one host
+    timeout --> total timeout in seconds for one request
+    """
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout),
+                                 headers={'Accept': 'application/json', 'Accept-Encoding': 'gzip, deflate'})
+
+
+class AsyncApiInstance:
+    def __init__(self, api_key, session=None, max_concurrency:int=8, scheduler=None, integration_url=None):
+        """
+        asyncio version of ApiInstance. uses the same Urls builder and returns the same data.
+
+        session: aiohttp.ClientSession to use. when None the instance creates its own and closes it in close() / on leaving `async with`.
+        sharing one session between many instances shares its connection pool.
+        max_concurrency: max requests this instance has in flight at once.
+        scheduler: rate_limit.ApiScheduler every request goes through. defaults to the shared rate_limit.get_default_scheduler.
+        integration_url: root of the Integration API. defaults to url_classes.get_integration_url (MAPSINDOORS_INTEGRATION_URL or production).
+
+        examples
+        -------
+
+        async with AsyncApiInstance(api_key) as instance:
+            location_types = await instance.get_location_types()
+        """
+        self.api_key = api_key
+        self.url = Urls(api_key, response_format="json", integration_url=integration_url)
+        self.session = session
+        self._owns_session = session is None
+        self.max_concurrency = max_concurrency
+        self.scheduler = scheduler if scheduler is not None else get_default_scheduler()
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    async def close(self):
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _get_session(self):
+        if self.session is None:
+            self.session = create_async_session()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.session
+
+    async def _get(self, session, url):
+        return await self.scheduler.request_async(session, 'GET', url, api_key=self.api_key, headers={'Accept': 'application/json'})
+
+    async def _get_json(self, url):
+        session = self._get_session()
+        async with self._semaphore:
+            async with await self._get(session, url) as response:
+                metrics = get_metrics()
+                if metrics is None:
+                    return await response.json(content_type=None)
+                body = await response.read()
+                endpoint = endpoint_name(url)
+                metrics.increment('mapsindoors_http_response_bytes_total', len(body), endpoint=endpoint)
+                start = time.perf_counter()
+                data = json.loads(body)
+                metrics.observe('mapsindoors_http_parse_seconds', time.perf_counter() - start, endpoint=endpoint)
+                return data
+
+    async def get_app_user_roles(self):
+        return await self._get_json(self.url.app_user_roles_url())
+
+    #returns the full datasest for all geodata objects in a solution
+    async def get_raw_geodata(self):
+        return await self._get_json(self.url.geodata_url())
+
+    #same data as get_raw_geodata, but parsed one item at a time while it downloads.
+    async def iter_raw_geodata(self, chunk_size:int=65536):
+        session = self._get_session()
+        parser = JsonArrayParser()
+        async with self._semaphore:
+            async with await self._get(session, self.url.geodata_url()) as response:
+                response.raise_for_status()
+                metrics = get_metrics()
+                received = 0
+                try:
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        received += len(chunk)
+                        for item in parser.feed(chunk):
+                            yield item
+                finally:
+                    if metrics is not None:
+                        metrics.increment('mapsindoors_http_response_bytes_total', received, endpoint=self.url.geodata)
+        for item in parser.close():
+            yield item
+
+    async def get_location_types(self):
+        return await self._get_json(self.url.display_types_url())
+
+    async def get_categories(self):
+        return await self._get_json(self.url.categories_url())
+
+
+class AsyncGeoFunctions:
+    """
+    Async factory for GeoFunctions. Downloads everything with AsyncApiInstance, so nothing blocks the event loop while
+    waiting on the network, and returns a normal GeoFunctions.
+
+    examples
+    -------
+
+    geo_functions = await AsyncGeoFunctions.create(api_key)
+
+    async with create_async_session() as session:
+        solutions = await AsyncGeoFunctions.create_many(api_keys, session=session, max_concurrency=20)
+    """
+
+    @staticmethod
+    async def create(api_key, session=None, stream:bool=False, max_concurrency:int=4, integration_url=None, scheduler=None):
+        """
+        Fetches the four endpoints of one solution concurrently and builds a GeoFunctions from them.
+
+        Parameters
+        ----------
+        api_key --> the solution's api key
+        session --> optional aiohttp.ClientSession to share. one is created (and closed again) when it's None
+        stream --> True parses geodata items while they download instead of parsing the whole response at the end, so the
+                   response text is never held in full
+        max_concurrency --> max requests in flight for this solution
+        integration_url --> root of the Integration API, see AsyncApiInstance. the GeoFunctions uses it too
+        scheduler --> rate_limit.ApiScheduler the requests go through, see AsyncApiInstance
+
+        Returns
+        -------
+
+        a GeoFunctions instance.
+        """
+        from mapsindoors.geo_functions import GeoFunctions
+
+        async with AsyncApiInstance(api_key, session=session, max_concurrency=max_concurrency, scheduler=scheduler,
+                                    integration_url=integration_url) as instance:
+            if stream == True:
+                geodata = _collect_items(instance.iter_raw_geodata())
+            else:
+                geodata = instance.get_raw_geodata()
+            geodata, location_types, categories, app_user_roles = await asyncio.gather(
+                geodata, instance.get_location_types(), instance.get_categories(), instance.get_app_user_roles())
+        # building the indexes is cpu work, a worker thread keeps the event loop free to serve other requests meanwhile
+        return await asyncio.to_thread(GeoFunctions.from_data, api_key, geodata, location_types, categories, app_user_roles,
+                                       integration_url=integration_url)
+
+    @staticmethod
+    async def create_many(api_keys, session=None, stream:bool=False, max_concurrency:int=10, integration_url=None, scheduler=None):
+        """
+        Builds a GeoFunctions for every api key, at most max_concurrency solutions at a time.
+        Cancelling the call cancels every download that is still running.
+        integration_url and scheduler are used for every solution, see create. every solution shares session, or one
+        session (so one connection pool) that is created here and closed again at the end when session is None.
+
+        Returns
+        -------
+
+        dict of api_key --> GeoFunctions. a solution that failed to load holds the exception instead.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        owns_session = session is None
+        if owns_session:
+            session = create_async_session()
+
+        async def create_one(api_key):
+            async with semaphore:
+                return await AsyncGeoFunctions.create(api_key, session=session, stream=stream, integration_url=integration_url,
+                                                      scheduler=scheduler)
+
+        api_keys = list(api_keys)
+        try:
+            results = await asyncio.gather(*(create_one(api_key) for api_key in api_keys), return_exceptions=True)
+        finally:
+            if owns_session:
+                await session.close()
+        for result in results:
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+        return dict(zip(api_keys, results))
+
+
+async def _collect_items(items):
+    # a plain list, from_data builds the store from it. a store built here would be copied by GeodataStore.from_items
+    return [item async for item in items]
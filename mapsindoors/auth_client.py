@@ -1,20 +1,196 @@
 import requests
 import json
+import asyncio
+import threading
+import time
 from mapsindoors.url_classes import *
+from mapsindoors.http_session import *
+from mapsindoors.instrumentation import *
+
+
+class TokenProvider:
+    def __init__(self, username, password, session=None, timeout=DEFAULT_TIMEOUT, refresh_margin:float=300,
+                 default_expires_in:float=3600, retry_interval:float=5, auth_url=None):
+        """
+        Gets access tokens from the MapsIndoors auth server and keeps the current one until shortly before it expires.
+
+        - get_token returns the cached token without a request while it's valid
+        - in the last refresh_margin seconds before it expires, the next caller starts a refresh on a background thread
+          and still gets the cached token straight away, so nobody waits for the auth server as long as the token is used
+        - only when the token has expired (e.g. after a long idle time) does get_token block. one thread fetches, the
+          others wait for that fetch instead of sending their own
+        - get_token_async does the same without blocking the event loop
+
+        Parameters
+        ----------
+        username, password --> MapsIndoors user
+        session --> requests.Session to use. defaults to the shared session from http_session.get_default_session
+        refresh_margin --> seconds before expiry when the background refresh starts. at most half the token's lifetime
+        default_expires_in --> lifetime used when the auth server doesn't send expires_in
+        retry_interval --> seconds to wait after a failed background refresh before trying again
+        auth_url --> token endpoint. defaults to url_classes.get_auth_url (MAPSINDOORS_AUTH_URL or production)
+
+        examples
+        -------
+
+        provider = TokenProvider(username, password)
+        headers = {'Authorization': 'Bearer ' + provider.get_token()}
+        provider.metrics()['mean_refresh_seconds']
+        """
+        self.username = username
+        self.password = password
+        self.session = session if session is not None else get_default_session()
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        self.default_expires_in = default_expires_in
+        self.retry_interval = retry_interval
+        self.auth_url = auth_url or get_auth_url()
+        # (token, monotonic time it expires at, time the background refresh starts). replaced as a whole, so readers never
+        # see a token with another token's expiry
+        self._state = (None, 0.0, 0.0)
+        self._fetch_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._refreshing = False
+        self._retry_at = 0.0
+        self._metrics = {'cache_hits': 0, 'fetches': 0, 'background_refreshes': 0, 'failures': 0,
+                         'last_refresh_seconds': None, 'max_refresh_seconds': None, 'total_refresh_seconds': 0.0}
+
+    def get_token(self):
+        """returns a valid access token (without the 'Bearer ' prefix)"""
+        token, expires_at, refresh_at = self._state
+        now = time.monotonic()
+        if token is not None and now < expires_at:
+            self._count('cache_hits')
+            if now >= refresh_at:
+                self._refresh_in_background(token)
+            return token
+        with self._fetch_lock:
+            # another thread may have fetched while this one waited for the lock
+            token, expires_at, _ = self._state
+            if token is not None and time.monotonic() < expires_at:
+                self._count('cache_hits')
+                return token
+            return self._fetch()
+
+    async def get_token_async(self):
+        """get_token for asyncio code. the cached token is returned right away, a fetch runs on a worker thread"""
+        token, expires_at, _ = self._state
+        if token is not None and time.monotonic() < expires_at:
+            return self.get_token()
+        return await asyncio.to_thread(self.get_token)
+
+    def refresh(self, used_token=None):
+        """
+        Fetches a new token now, e.g. after the server answered 401. when used_token is given and another thread has
+        already replaced it, that newer token is returned instead of fetching again.
+        """
+        with self._fetch_lock:
+            token, expires_at, _ = self._state
+            if used_token is not None and token is not None and token != used_token and time.monotonic() < expires_at:
+                return token
+            return self._fetch()
+
+    def metrics(self):
+        """
+        counters and refresh timings: cache_hits, fetches, background_refreshes, failures, last/max/mean_refresh_seconds,
+        and expires_in_seconds of the current token
+        """
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics['mean_refresh_seconds'] = metrics['total_refresh_seconds'] / metrics['fetches'] if metrics['fetches'] else None
+        token, expires_at, _ = self._state
+        metrics['expires_in_seconds'] = max(0.0, expires_at - time.monotonic()) if token is not None else None
+        return metrics
+
+    def _fetch(self):
+        # only called while holding _fetch_lock
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        payload = {'client_id': 'client', 'username': self.username, 'grant_type': 'password', 'password': self.password}
+        # expiry counts from when the request was sent, the token can't have been issued any earlier
+        sent_at = time.monotonic()
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self.session.post(url=self.auth_url, data=payload, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+            token = data['access_token']
+        except Exception:
+            self._count('failures')
+            raise
+        finally:
+            metrics = get_metrics()
+            if metrics is not None:
+                observe_request(metrics, 'POST', self.auth_url, time.perf_counter() - start, None if response is None else response.status_code)
+        seconds = time.perf_counter() - start
+        expires_in = float(data.get('expires_in') or self.default_expires_in)
+        # short lived tokens are refreshed after half their lifetime instead of all the time
+        refresh_in = max(expires_in - self.refresh_margin, expires_in / 2)
+        self._state = (token, sent_at + expires_in, sent_at + refresh_in)
+        with self._metrics_lock:
+            self._metrics['fetches'] += 1
+            self._metrics['last_refresh_seconds'] = seconds
+            self._metrics['total_refresh_seconds'] += seconds
+            if self._metrics['max_refresh_seconds'] is None or seconds > self._metrics['max_refresh_seconds']:
+                self._metrics['max_refresh_seconds'] = seconds
+        return token
+
+    def _refresh_in_background(self, used_token):
+        with self._metrics_lock:
+            if self._refreshing or time.monotonic() < self._retry_at:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, args=(used_token,), daemon=True).start()
+
+    def _background_refresh(self, used_token):
+        try:
+            self.refresh(used_token)
+            self._count('background_refreshes')
+        except Exception:
+            # the cached token is still valid for a while. the next caller after retry_interval tries again
+            self._retry_at = time.monotonic() + self.retry_interval
+        finally:
+            self._refreshing = False
+
+    def _count(self, name):
+        with self._metrics_lock:
+            self._metrics[name] += 1
+
 
 class OAuthToken:
-    def __init__(self, username, password, api_key):
+    def __init__(self, username, password, api_key, session=None, timeout=DEFAULT_TIMEOUT, refresh_margin:float=300,
+                 auth_url=None, integration_url=None):
+        """
+        Bearer token for the write endpoints of a solution. The token is fetched right away, so wrong credentials fail
+        here, and after that it's cached and refreshed by a TokenProvider before it expires.
+
+        access_token is always a valid 'Bearer ...' string, it's safe to read from many threads. provider.metrics()
+        has the cache hits and refresh timings.
+
+        auth_url and integration_url replace the production endpoints, see url_classes.get_auth_url and get_integration_url.
+        """
         self.username = username
         self.password = password
         self.api_key = api_key
-        self.access_token = self.get_access_token()
-        self.url = Urls(api_key, response_format="json")
-            
+        self.session = session if session is not None else get_default_session()
+        self.timeout = timeout
+        self.provider = TokenProvider(username, password, session=self.session, timeout=timeout, refresh_margin=refresh_margin,
+                                      auth_url=auth_url)
+        self.provider.get_token()
+        self.url = Urls(api_key, response_format="json", integration_url=integration_url)
+
+    @property
+    def access_token(self):
+        return 'Bearer ' + self.provider.get_token()
+
     def get_access_token(self):
-        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        url = 'https://auth.mapsindoors.com/connect/token'
-        payload = {'client_id': 'client', 'username': self.username, 'grant_type': 'password', 'password': self.password}
-        response = requests.post(url=url, data=payload, headers=headers)
-        data = response.json()['access_token']
-        bearer_token = 'Bearer ' + data
-        return bearer_token
\ No newline at end of file
+        return self.access_token
+
+    async def get_access_token_async(self):
+        return 'Bearer ' + await self.provider.get_token_async()
+
+    def refresh(self, used_token=None):
+        """gets a new token now, see TokenProvider.refresh. used_token may include the 'Bearer ' prefix"""
+        if used_token is not None and used_token.startswith('Bearer '):
+            used_token = used_token[len('Bearer '):]
+        return 'Bearer ' + self.provider.refresh(used_token)
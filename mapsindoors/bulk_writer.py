@@ -0,0 +1,225 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from urllib3.exceptions import NewConnectionError
+from mapsindoors.geodata import *
+from mapsindoors.http_session import *
+from mapsindoors.rate_limit import *
+
+
+#methods that can be sent again without changing the outcome.  a create (POST) that may have reached the server is never repeated.
+IDEMPOTENT_METHODS = ('PUT', 'DELETE')
+#statuses where the server turned the request away without processing it.  the scheduler already retries these, a chunk
+#only sees one when it gave up, so the chunk isn't sent again
+REFUSED_STATUSES = THROTTLE_STATUSES
+#statuses where the request may or may not have been applied
+UNCERTAIN_STATUSES = (500, 502, 504)
+
+
+class BulkWriter:
+    def __init__(self, token, session=None, chunk_size:int=250, max_workers:int=4, max_retries:int=4,
+                 backoff:float=0.5, max_backoff:float=30, timeout=DEFAULT_TIMEOUT, progress=None, scheduler=None):
+        """
+        Batched create/update/delete for geodata, categories and location (display) types.
+
+        Items are sent in chunks of chunk_size, at most max_workers chunks at a time. A chunk that fails is retried up to
+        max_retries times with jittered exponential backoff:
+        - updates (PUT) and deletes (DELETE) are idempotent and are retried on connection errors, timeouts and 500/502/504
+        - creates (POST) are only retried when the connection was never made, so the server can't have processed them.
+          after a timeout or a 500 the items are reported as failed, so nothing is created twice
+        - 429/503 are retried by the scheduler (see rate_limit.ApiScheduler max_retries). when it still gets one after its
+          retries the items are reported as failed instead of starting the scheduler's retries all over again
+        - a 400/404/409/422 rejects the whole request, so the chunk is split in halves until the items that fail are found
+        - a 401 gets a new token from the OAuthToken and the chunk is sent again. when logging in fails it is retried with
+          the same backoff, and after max_retries the chunk's items are reported as failed with status 401
+
+        Parameters
+        ----------
+        token --> OAuthToken of a user with write access. its api_key decides the solution that is written to
+        session --> requests.Session to use. defaults to the shared session from http_session.get_default_session
+        chunk_size --> items per request
+        max_workers --> max requests in flight
+        max_retries --> retries per chunk
+        backoff, max_backoff --> first and longest wait in seconds between retries
+        progress --> optional callback(result, done, total) called once per item as soon as its chunk is finished.
+                     it's called from the thread that started the write, so it doesn't have to be thread safe
+        scheduler --> rate_limit.ApiScheduler the requests go through, it paces them and handles throttling (429/503 and
+                      Retry-After). defaults to the shared rate_limit.get_default_scheduler, so reads and writes for the
+                      same solution share one limit
+
+        Returns
+        -------
+
+        every write method returns a dict with
+        'total': number of items
+        'succeeded': number of items written
+        'failed': results of the items that weren't written
+        'results': one result per item, in the order they were given.
+                   {'index', 'id', 'ok', 'status', 'error', 'response'}. response is the item's entry when the server
+                   answers with a list of one entry per item (e.g. the ids of created locations), otherwise None
+
+        examples
+        -------
+
+        token = OAuthToken(username, password, api_key)
+        writer = BulkWriter(token, chunk_size=500, max_workers=8)
+        summary = writer.update_geodata(changed_locations)
+        summary['failed'] --> []
+        writer.delete_geodata(['8d9b21b028df40e38f8c52d7'])
+        """
+        self.token = token
+        self.url = token.url
+        self.session = session if session is not None else get_default_session()
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.progress = progress
+        self.scheduler = scheduler if scheduler is not None else get_default_scheduler()
+
+    #geodata takes dicts or Geodata objects.  delete takes ids, or dicts/objects with an id.
+    def create_geodata(self, items):
+        return self._write('POST', self.url.geodata_url(), _payloads(items))
+
+    def update_geodata(self, items):
+        return self._write('PUT', self.url.geodata_url(), _payloads(items))
+
+    def delete_geodata(self, ids):
+        return self._write('DELETE', self.url.geodata_url(), _ids(ids))
+
+    def create_categories(self, categories):
+        return self._write('POST', self.url.categories_url(), _payloads(categories))
+
+    def update_categories(self, categories):
+        return self._write('PUT', self.url.categories_url(), _payloads(categories))
+
+    def delete_categories(self, ids):
+        return self._write('DELETE', self.url.categories_url(), _ids(ids))
+
+    def create_location_types(self, location_types):
+        return self._write('POST', self.url.display_types_url(), _payloads(location_types))
+
+    def update_location_types(self, location_types):
+        return self._write('PUT', self.url.display_types_url(), _payloads(location_types))
+
+    def delete_location_types(self, ids):
+        return self._write('DELETE', self.url.display_types_url(), _ids(ids))
+
+    def _write(self, method, url, payloads):
+        total = len(payloads)
+        results = [None] * total
+        failed = []
+        done = 0
+        chunks = [list(range(start, min(start + self.chunk_size, total))) for start in range(0, total, self.chunk_size)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._send_chunk, method, url, payloads, positions) for positions in chunks]
+            for future in as_completed(futures):
+                for result in future.result():
+                    results[result['index']] = result
+                    done += 1
+                    if not result['ok']:
+                        failed.append(result)
+                    if self.progress is not None:
+                        self.progress(result, done, total)
+        failed.sort(key=lambda result: result['index'])
+        return {'total': total, 'succeeded': total - len(failed), 'failed': failed, 'results': results}
+
+    def _send_chunk(self, method, url, payloads, positions):
+        """sends one chunk with retries. returns one result per position"""
+        body = [payloads[position] for position in positions]
+        attempt = 0
+        token_refreshed = False
+        refresh_token = None
+        while True:
+            try:
+                if refresh_token is not None:
+                    # chunks that get a 401 at the same time only log in once, see TokenProvider.refresh
+                    self.token.refresh(refresh_token)
+                    refresh_token = None
+                access_token = self.token.access_token
+            except Exception as exception:
+                # the auth server is down, timed out or answered with an error. back off and log in again, and when
+                # that keeps failing report the chunk as unauthorized instead of aborting the whole write
+                if attempt < self.max_retries:
+                    time.sleep(self._retry_delay(attempt, None))
+                    attempt += 1
+                    continue
+                return [_result(payloads, position, False, 401, repr(exception), None) for position in positions]
+            response = error = None
+            try:
+                response = self.scheduler.request(self.session, method, url, api_key=self.token.api_key, json=body, timeout=self.timeout,
+                                                  headers={'Authorization': access_token, 'Accept': 'application/json'})
+            except requests.exceptions.RequestException as exception:
+                error = exception
+            status = None if response is None else response.status_code
+
+            if response is not None and response.ok:
+                return _chunk_results(payloads, positions, response)
+            if status == 401 and not token_refreshed:
+                refresh_token = access_token
+                token_refreshed = True
+                continue
+            if status in (400, 404, 409, 422) and len(positions) > 1:
+                middle = len(positions) // 2
+                return self._send_chunk(method, url, payloads, positions[:middle]) + self._send_chunk(method, url, payloads, positions[middle:])
+            if attempt < self.max_retries and self._should_retry(method, status, error):
+                time.sleep(self._retry_delay(attempt, response))
+                attempt += 1
+                continue
+            message = repr(error) if error is not None else response.text[:500]
+            return [_result(payloads, position, False, status, message, None) for position in positions]
+
+    def _should_retry(self, method, status, error):
+        if error is not None:
+            return method in IDEMPOTENT_METHODS or _not_sent(error)
+        if status in REFUSED_STATUSES:
+            return False
+        return status in UNCERTAIN_STATUSES and method in IDEMPOTENT_METHODS
+
+    def _retry_delay(self, attempt, response):
+        retry_after = None if response is None else parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        # full jitter, so chunks that failed together don't all come back at the same moment
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+def _payloads(items):
+    return [item.geodata if isinstance(item, Geodata) else item for item in items]
+
+
+def _ids(items):
+    ids = []
+    for item in items:
+        if isinstance(item, Geodata):
+            item = item.id
+        elif isinstance(item, dict):
+            item = item['id']
+        ids.append(item)
+    return ids
+
+
+def _not_sent(error):
+    """True when a request failed before it reached the server"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _result(payloads, position, ok, status, error, response):
+    payload = payloads[position]
+    return {'index': position, 'id': payload.get('id') if isinstance(payload, dict) else payload,
+            'ok': ok, 'status': status, 'error': error, 'response': response}
+
+
+def _chunk_results(payloads, positions, response):
+    try:
+        data = response.json() if response.content else None
+    except ValueError:
+        data = None
+    per_item = data if isinstance(data, list) and len(data) == len(positions) else [None] * len(positions)
+    return [_result(payloads, position, True, response.status_code, None, item_response) for position, item_response in zip(positions, per_item)]
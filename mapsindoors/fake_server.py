@@ -0,0 +1,313 @@
+"""
+Local stand-in for the Integration API and the auth server, for load tests and benchmarks that must not reach production.
+
+Serves GET /{api_key}/api/geodata, /displaytypes, /categories and /appUserRoles from a synthetic solution
+(mapsindoors.synthetic) and POST /connect/token, over keep-alive HTTP/1.1. POST/PUT/DELETE on the same endpoints
+change the served solution, for BulkWriter.
+
+run it on its own and point the library at it:
+    python -m mapsindoors.fake_server --locations 100000 --port 8080 --latency 0.05 --throttle-rate 0.02
+    export MAPSINDOORS_INTEGRATION_URL=http://127.0.0.1:8080
+    export MAPSINDOORS_AUTH_URL=http://127.0.0.1:8080/connect/token
+"""
+import argparse
+import gzip
+import hashlib
+import http.server
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from mapsindoors.synthetic import generate_solution
+
+
+#endpoint name in the url --> key of the generate_solution result
+ENDPOINTS = {'geodata': 'geodata', 'displaytypes': 'displaytypes', 'categories': 'categories', 'appUserRoles': 'appUserRoles'}
+TOKEN_PATH = '/connect/token'
+
+
+class FakeIntegrationServer:
+    def __init__(self, locations:int=1000, host:str='127.0.0.1', port:int=0, latency:float=0.0, latency_jitter:float=0.0,
+                 error_rate:float=0.0, throttle_rate:float=0.0, retry_after:float=1, gzip_responses:bool=True,
+                 token_expires_in:int=3600, solution=None, seed:int=0, reject_ids=()):
+        """
+        Integration API and auth server in a background thread. Every endpoint answers for any api key.
+
+        Parameters
+        ----------
+        locations --> size of the generated solution, and with it of the /geodata payload
+        host, port --> address to listen on. port 0 picks a free port, see url
+        latency --> seconds added before every response
+        latency_jitter --> up to this many seconds more, picked at random per request
+        error_rate --> share of requests answered with a 500
+        throttle_rate --> share of requests answered with a 429 and a Retry-After of retry_after seconds
+        gzip_responses --> gzip the body when the client sends Accept-Encoding: gzip. bodies are compressed once up front
+        token_expires_in --> expires_in of the tokens handed out by /connect/token
+        solution --> a generate_solution result to serve instead of generating one
+        seed --> seed for the solution and for the injected errors
+        reject_ids --> ids that make a write answer 400, like the API rejecting a whole request for one bad item
+
+        GET responses carry an ETag and answer If-None-Match with a 304, like the real API, so SnapshotCache revalidation
+        can be measured too. stats() counts the requests by endpoint and status.
+
+        Writes need the bearer token of a token handed out by /connect/token, otherwise they get a 401. expire_tokens()
+        revokes every token handed out so far. The body is a json list: POST adds the items (an item without an id gets
+        one) and answers with their ids, PUT replaces items by id and answers 404 when one doesn't exist, DELETE takes ids.
+
+        examples
+        -------
+
+        with FakeIntegrationServer(locations=10000, latency=0.02) as server:
+            geo_functions = GeoFunctions('demo', integration_url=server.url)
+            token = OAuthToken('user', 'password', 'demo', auth_url=server.auth_url, integration_url=server.url)
+            server.stats()
+        """
+        self.solution = solution if solution is not None else generate_solution(locations, seed=seed)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.gzip_responses = gzip_responses
+        self.token_expires_in = token_expires_in
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens_issued = 0
+        self._valid_tokens = set()
+        self.reject_ids = set(reject_ids)
+        self._stats = {'requests': 0, 'bytes_sent': 0, 'by_endpoint': {}, 'by_status': {}}
+        self._bodies = {}
+        for endpoint in ENDPOINTS:
+            self._encode(endpoint)
+        self._server = _Server((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """root to pass as integration_url, e.g. http://127.0.0.1:50123"""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def auth_url(self):
+        return self.url + TOKEN_PATH
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return json.loads(json.dumps(self._stats))
+
+    def expire_tokens(self):
+        """every token handed out so far gets a 401 from now on"""
+        with self._lock:
+            self._valid_tokens.clear()
+
+    def _encode(self, endpoint):
+        raw = json.dumps(self.solution[ENDPOINTS[endpoint]]).encode()
+        etag = '"%s"' % hashlib.blake2b(raw, digest_size=16).hexdigest()
+        self._bodies[endpoint] = (raw, gzip.compress(raw, compresslevel=5) if self.gzip_responses else None, etag)
+
+    def _write(self, method, endpoint, body):
+        """applies a write to the solution. returns (status, response body)"""
+        if not isinstance(body, list):
+            return 400, {'error': 'expected a json list'}
+        ids = [item if method == 'DELETE' else item.get('id') for item in body]
+        if self.reject_ids.intersection(ids):
+            return 400, {'error': 'rejected item'}
+        with self._lock:
+            items = self.solution[ENDPOINTS[endpoint]]
+            positions = {item['id']: position for position, item in enumerate(items)}
+            if method == 'POST':
+                created = []
+                for item in body:
+                    item = dict(item)
+                    item.setdefault('id', '%024x' % self._random.getrandbits(96))
+                    items.append(item)
+                    created.append(item['id'])
+                response = created
+            elif any(location_id not in positions for location_id in ids):
+                return 404, {'error': 'not found'}
+            elif method == 'PUT':
+                for item in body:
+                    items[positions[item['id']]] = item
+                response = None
+            else:
+                deleted = set(ids)
+                items[:] = [item for item in items if item['id'] not in deleted]
+                response = None
+            self._encode(endpoint)
+        return 200, response
+
+    def _injected_status(self):
+        # one draw per request, so error_rate and throttle_rate add up to the share of failed requests
+        with self._lock:
+            draw = self._random.random()
+            jitter = self._random.uniform(0, self.latency_jitter) if self.latency_jitter else 0.0
+        if draw < self.throttle_rate:
+            status = 429
+        elif draw < self.throttle_rate + self.error_rate:
+            status = 500
+        else:
+            status = None
+        return status, self.latency + jitter
+
+    def _issue_token(self):
+        with self._lock:
+            self._tokens_issued += 1
+            token = f'fake-token-{self._tokens_issued}'
+            self._valid_tokens.add(token)
+        return {'access_token': token, 'expires_in': self.token_expires_in, 'token_type': 'Bearer'}
+
+    def _count(self, endpoint, status, size):
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['bytes_sent'] += size
+            self._stats['by_endpoint'][endpoint] = self._stats['by_endpoint'].get(endpoint, 0) + 1
+            self._stats['by_status'][str(status)] = self._stats['by_status'].get(str(status), 0) + 1
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # clients dropping keep-alive connections at the end of a run aren't worth a traceback
+        pass
+
+
+def _handler(fake):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # headers and body go out in separate writes. with Nagle on, keep-alive clients wait ~40ms on every response
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            endpoint = urlsplit(self.path).path.rstrip('/').split('/')[-1]
+            if endpoint not in fake._bodies:
+                self._send(endpoint, 404, b'{"error":"not found"}')
+                return
+            if self._inject(endpoint):
+                return
+            raw, compressed, etag = fake._bodies[endpoint]
+            if self.headers.get('If-None-Match') == etag:
+                self._send(endpoint, 304, b'', {'ETag': etag})
+                return
+            headers = {'ETag': etag, 'Content-Type': 'application/json'}
+            if compressed is not None and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                headers['Content-Encoding'] = 'gzip'
+                self._send(endpoint, 200, compressed, headers)
+            else:
+                self._send(endpoint, 200, raw, headers)
+
+        def do_POST(self):
+            # the body has to be read even when it isn't used (any credentials are accepted), or it is taken for the next request
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            path = urlsplit(self.path).path.rstrip('/')
+            if path != TOKEN_PATH:
+                self._write('POST', path, body)
+                return
+            if self._inject('token'):
+                return
+            self._send('token', 200, json.dumps(fake._issue_token()).encode(), {'Content-Type': 'application/json'})
+
+        def do_PUT(self):
+            self._write('PUT', urlsplit(self.path).path.rstrip('/'), self.rfile.read(int(self.headers.get('Content-Length') or 0)))
+
+        def do_DELETE(self):
+            self._write('DELETE', urlsplit(self.path).path.rstrip('/'), self.rfile.read(int(self.headers.get('Content-Length') or 0)))
+
+        def _write(self, method, path, body):
+            endpoint = path.split('/')[-1]
+            if endpoint not in fake._bodies:
+                self._send(method.lower(), 404, b'{"error":"not found"}')
+                return
+            if self._inject(endpoint):
+                return
+            authorization = self.headers.get('Authorization', '')
+            with fake._lock:
+                authorized = authorization.startswith('Bearer ') and authorization[len('Bearer '):] in fake._valid_tokens
+            if not authorized:
+                self._send(endpoint, 401, b'{"error":"unauthorized"}')
+                return
+            try:
+                body = json.loads(body or b'null')
+            except ValueError:
+                self._send(endpoint, 400, b'{"error":"invalid json"}')
+                return
+            status, response = fake._write(method, endpoint, body)
+            content = b'' if response is None else json.dumps(response).encode()
+            self._send(endpoint, status, content, {'Content-Type': 'application/json'} if content else None)
+
+        def _inject(self, endpoint):
+            """sleeps for the latency and sends an injected error. returns True when it did"""
+            status, delay = fake._injected_status()
+            if delay:
+                time.sleep(delay)
+            if status == 429:
+                self._send(endpoint, 429, b'{"error":"too many requests"}', {'Retry-After': str(fake.retry_after)})
+            elif status == 500:
+                self._send(endpoint, 500, b'{"error":"injected error"}')
+            return status is not None
+
+        def _send(self, endpoint, status, body, headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            fake._count(endpoint, status, len(body))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--locations', type=int, default=1000)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with a 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of requests answered with a 429')
+    parser.add_argument('--retry-after', type=float, default=1)
+    parser.add_argument('--no-gzip', action='store_true')
+    parser.add_argument('--token-expires-in', type=int, default=3600)
+    args = parser.parse_args()
+
+    server = FakeIntegrationServer(locations=args.locations, host=args.host, port=args.port, latency=args.latency,
+                                   latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                                   throttle_rate=args.throttle_rate, retry_after=args.retry_after,
+                                   gzip_responses=not args.no_gzip, token_expires_in=args.token_expires_in)
+    print(f'MAPSINDOORS_INTEGRATION_URL={server.url}')
+    print(f'MAPSINDOORS_AUTH_URL={server.auth_url}')
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == '__main__':
+    main()
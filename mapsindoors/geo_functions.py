@@ -1,42 +1,470 @@
 from mapsindoors.geodata import *
+from mapsindoors.geodata_store import *
+from mapsindoors.geodata_file import *
+from mapsindoors.spatial_index import *
 from mapsindoors.integration_api_instance import *
 from mapsindoors.url_classes import *
-import requests
 import json
-from shapely.geometry import Point
 from shapely.geometry.polygon import Polygon
+from shapely.prepared import prep
+from shapely.strtree import STRtree
+from shapely.geometry import box
 from math import radians, cos, sin, asin, sqrt
 import pyproj
-from shapely.ops import transform
-import re
-import os
+from functools import lru_cache
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 
 
 
+#meters, the radius used by haversine and haversine_np
+EARTH_RADIUS_METERS = 6371000
+
+
+#vectorized version of GeoFunctions.haversine.  takes scalars or numpy arrays (broadcast against each other) in degrees and returns meters.
+def haversine_np(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = map(np.radians, [lon1, lat1, lon2, lat2])
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    c = 2 * np.arcsin(np.sqrt(a))
+    r = 6371 # Radius of earth in kilometers. Use 3956 for miles
+    return c * r * 1000
+
+
+#parents with at least this many rooms/areas get an STRtree for get_areas_within_radius.  below it one vectorized bbox
+#test over all of them is faster than asking a tree (measured: the tree only wins from about 3-4k boxes).
+POLYGON_TREE_MIN_ROWS = 4096
+
+
+#ellipsoid the buffers are computed on.  created once, pyproj.Geod holds no state between calls.
+WGS84_GEOD = pyproj.Geod(ellps='WGS84')
+
+
+@lru_cache(maxsize=8)
+def _circle_azimuths(resolution:int):
+    # the vertices of shapely's Point.buffer in an azimuthal equidistant projection centred on the point: starting east,
+    # clockwise, resolution segments per quarter circle.  as azimuths in degrees clockwise from north.
+    return 90 + np.arange(4 * resolution) * (90 / resolution)
+
+
+#vectorized geodesic circles.  lats, lons and meters are broadcast against each other.  returns an (N, 4 * resolution, 2) array of [lon, lat] rings without the closing point.
+def geodesic_point_buffers_np(lats, lons, meters, resolution:int=16):
+    lats, lons, meters = np.broadcast_arrays(np.atleast_1d(np.asarray(lats, dtype=np.float64)),
+                                             np.atleast_1d(np.asarray(lons, dtype=np.float64)),
+                                             np.atleast_1d(np.asarray(meters, dtype=np.float64)))
+    azimuths = _circle_azimuths(resolution)
+    count, vertices = len(lats), len(azimuths)
+    rings = np.empty((count, vertices, 2))
+    if count == 0:
+        return rings
+    # every vertex is the endpoint of the geodesic from the centre along its azimuth, which is exactly where the
+    # projection centred on the point puts it.  one call solves all of them
+    ring_lons, ring_lats, _ = WGS84_GEOD.fwd(np.repeat(lons, vertices), np.repeat(lats, vertices), np.tile(azimuths, count), np.repeat(meters, vertices))
+    rings[:, :, 0] = ring_lons.reshape(count, vertices)
+    rings[:, :, 1] = ring_lats.reshape(count, vertices)
+    return rings
+
+
 class GeoFunctions:
-    def __init__(self, api_key):
+    def __init__(self, api_key, stream:bool=False, session=None, cache=None, integration_url=None):
         """
         geodata_response: list of dictionaries of all geodata
         location_types : list of dictionaries of location types
         categories: list of dictionaries of categories
         url makes available all url's from the url_classes file.
-        geodata_objects is the (list of objects) dot notation form of the geodata response.
+        geodata_objects is the dot notation form of the geodata response. rows are turned into Geodata objects when they are read.
+        store is the columnar GeodataStore used for filtering, see filter_locations.
+
+        stream=True parses the geodata while it downloads and adds each item to the store straight away, instead of loading the whole response first.
+        use from_data to build an instance from data you already have (e.g. a file read with iter_json_array_file).
+        session is an optional requests.Session (see http_session.create_session). by default a shared pooled session is used.
+        cache is an optional SnapshotCache. unchanged data is then loaded from disk instead of downloaded. the cached path needs the whole response, so stream is ignored when a cache is given.
+        integration_url is the root of the Integration API, e.g. a fake_server.FakeIntegrationServer for load tests. defaults to MAPSINDOORS_INTEGRATION_URL or production.
         
         to perform write functionality you'll need to generate an OAuth token from the OAuth_token module. This requires a MapsIndoors User/Pass.
+        writes go through bulk_writer.BulkWriter, which takes that token.
+        """
+
+        self.instance = ApiInstance(api_key, session=session, cache=cache, integration_url=integration_url)
+        # the small endpoints download in the background while the geodata is fetched and indexed on this thread,
+        # so startup takes about as long as the slowest request instead of the sum of all four
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            location_types = pool.submit(self.instance.get_location_types)
+            categories = pool.submit(self.instance.get_categories)
+            app_user_roles = pool.submit(self.instance.get_app_user_roles)
+            if stream == True and cache is None:
+                geodata = self.instance.iter_raw_geodata()
+            else:
+                geodata = self.instance.get_raw_geodata()
+            self._load_geodata(api_key, geodata)
+            self._load_metadata(location_types.result(), categories.result(), app_user_roles.result())
+
+    @classmethod
+    def from_data(cls, api_key, geodata, location_types, categories, app_user_roles, session=None, integration_url=None):
+        """
+        Builds a GeoFunctions from data that has already been fetched, without calling the API for it.
+
+        Parameters
+        ----------
+        api_key --> the solution's api key
+        geodata --> list of geodata dicts, or any iterable of them (it's consumed one item at a time), or a GeodataStore.
+                    a list or store is copied, so refresh() and apply_geodata() never change it. the dicts are shared
+        location_types, categories, app_user_roles --> the /displaytypes, /categories and /appUserRoles responses
+
+        examples
+        -------
+
+        GeoFunctions.from_data(api_key, iter_json_array_file('geodata.json'), location_types, categories, app_user_roles)
+        """
+        geo_functions = cls.__new__(cls)
+        geo_functions.instance = ApiInstance(api_key, session=session, integration_url=integration_url)
+        geo_functions._load(api_key, geodata, location_types, categories, app_user_roles)
+        return geo_functions
+
+    @classmethod
+    def from_file(cls, api_key, path, session=None, integration_url=None):
+        """
+        Opens a file written by save() without loading it. The file is memory-mapped and read only, only the pages a query
+        touches are read, and every process that opens the same file shares them. So many worker processes can serve one
+        solution while each one only holds what it has looked at. Items are decoded from the file when they are returned.
+
+        refresh() and apply_geodata() can't be used on it, save a new file from a loaded instance and reopen that instead.
+
+        Parameters
+        ----------
+        api_key --> the solution's api key
+        path --> file written by save()
+
+        examples
+        -------
+
+        GeoFunctions(api_key).save('/srv/geodata/solution.migd')  # once, e.g. in the gunicorn master or a cron job
+        geo_functions = GeoFunctions.from_file(api_key, '/srv/geodata/solution.migd')  # in every worker
+        """
+        geodata_file = open_geodata_file(path)
+        geo_functions = cls.__new__(cls)
+        geo_functions.instance = ApiInstance(api_key, session=session, integration_url=integration_url)
+        geo_functions.api_key = api_key
+        geo_functions.url = geo_functions.instance.url
+        geo_functions.store = geodata_file.store
+        geo_functions.geodata_response = geodata_file.store.items
+        geo_functions.geodata_objects = geodata_file.store
+        geo_functions._row_by_id = geodata_file.store.row_by_id
+        for name, index in geodata_file.row_lists.items():
+            setattr(geo_functions, name, index)
+        for name, rows in geodata_file.row_columns.items():
+            setattr(geo_functions, name, rows)
+        geo_functions._ancestor_rows = geodata_file.ancestor_rows
+        geo_functions._polygon_index = {}
+        geo_functions._nearest_candidates = {}
+        geo_functions._row_hashes = None
+        geo_functions._load_metadata(geodata_file.location_types, geodata_file.categories, geodata_file.app_user_roles)
+        return geo_functions
+
+    def save(self, path):
         """
+        Writes the loaded data to a binary file that from_file can memory-map. see geodata_file.write_geodata_file for the layout.
+        """
+        write_geodata_file(self, path)
+
+    def _load(self, api_key, geodata, location_types, categories, app_user_roles):
+        self._load_geodata(api_key, geodata)
+        self._load_metadata(location_types, categories, app_user_roles)
 
-        self.instance = ApiInstance(api_key)
+    def _load_geodata(self, api_key, geodata):
         self.api_key = api_key
-        self.geodata_response = self.instance.get_raw_geodata()
-        self.location_types = self.instance.get_location_types()
-        self.categories = self.instance.get_categories()
-        self.app_user_roles = self.instance.get_app_user_roles()
-        self.url = Urls(api_key)
-        geodata_objects = []
-        for item in self.geodata_response:
-            geodata_objects.append(Geodata(item))
-        self.geodata_objects = geodata_objects
-    
+        self.url = self.instance.url
+        self.store = GeodataStore.from_items(geodata)
+        self.geodata_response = self.store.items
+        self.geodata_objects = self.store
+        self._build_indexes()
+        self._build_hierarchy()
+        #parentId --> spatial index of the rooms/areas directly under that parent.  built on first use by get_areas_within_radius.
+        self._polygon_index = {}
+        #(parentId or None, displayTypeId, category id) --> (candidate rows, PointIndex) for nearest().  built on first use.
+        self._nearest_candidates = {}
+        #row --> item_hash of the row's dict.  computed by the first refresh, then kept up to date by it.
+        self._row_hashes = None
+
+    def _load_metadata(self, location_types, categories, app_user_roles):
+        self.location_types = location_types
+        self.categories = categories
+        self.app_user_roles = app_user_roles
+
+    #secondary indexes over geodata_response.  every index maps a key to row numbers so json and object results come from the same row.
+    def _build_indexes(self):
+        """
+        Builds the lookup tables used by the get_location* methods. Called once after the geodata has been loaded.
+        Every list of rows is kept sorted, so results come back in geodata_response order.
+
+        _row_by_id: id --> row
+        _rows_by_external_id: case-folded externalId --> list of rows
+        _rows_by_alias: case-folded alias --> list of rows
+        _rows_by_display_type_id: displayTypeId --> list of rows (venues, buildings and floors are left out)
+        _rows_by_base_type: baseType --> list of rows
+        _child_rows: parentId --> list of rows
+        """
+        self._row_by_id = self.store.row_by_id
+        self._rows_by_external_id = {}
+        self._rows_by_alias = {}
+        self._rows_by_display_type_id = {}
+        self._rows_by_base_type = {}
+        self._child_rows = {}
+        for row, item in enumerate(self.geodata_response):
+            for index, key in self._index_entries(item):
+                index.setdefault(key, []).append(row)
+
+    def _index_entries(self, item):
+        """(index, key) pairs for every list of rows that item belongs in"""
+        entries = [(self._rows_by_base_type, item['baseType'])]
+        external_id = item.get('externalId')
+        if external_id is not None:
+            entries.append((self._rows_by_external_id, external_id.casefold()))
+        for alias in {alias.casefold() for alias in item.get('aliases') or []}:
+            entries.append((self._rows_by_alias, alias))
+        if item['baseType'] not in ('venue', 'building', 'floor') and 'displayTypeId' in item:
+            entries.append((self._rows_by_display_type_id, item['displayTypeId']))
+        parent_id = item.get('parentId')
+        if parent_id is not None:
+            entries.append((self._child_rows, parent_id))
+        return entries
+
+    #parent/child structure of the solution.  venue --> building --> floor --> room/area/poi, or venue --> poi/area for outside locations.
+    def _build_hierarchy(self):
+        """
+        Builds the location tree once after the geodata has been loaded. _child_rows comes from _build_indexes.
+
+        _parent_row: row --> row of the parent, None when the parent isn't part of the geodata
+        _ancestor_rows: row --> tuple of rows from the direct parent up to the root
+        _venue_row, _building_row, _floor_row: row --> row of the venue/building/floor the location sits in, or None
+        """
+        rows_count = len(self.geodata_response)
+        self._parent_row = [None] * rows_count
+        for row, item in enumerate(self.geodata_response):
+            parent_id = item.get('parentId')
+            if parent_id is not None:
+                self._parent_row[row] = self._row_by_id.get(parent_id)
+
+        self._ancestor_rows = [None] * rows_count
+        for row in range(rows_count):
+            if self._ancestor_rows[row] is not None:
+                continue
+            # walk up until a row with a known chain is found, then fill the chain in on the way back down
+            path = []
+            current = row
+            while current is not None and self._ancestor_rows[current] is None and current not in path:
+                path.append(current)
+                current = self._parent_row[current]
+            chain = () if current is None or current in path else (current,) + self._ancestor_rows[current]
+            for path_row in reversed(path):
+                self._ancestor_rows[path_row] = chain
+                chain = (path_row,) + chain
+
+        self._venue_row = [None] * rows_count
+        self._building_row = [None] * rows_count
+        self._floor_row = [None] * rows_count
+        for row in range(rows_count):
+            self._set_levels(row)
+
+    def _set_levels(self, row):
+        venue_row = building_row = floor_row = None
+        for ancestor_row in self._ancestor_rows[row]:
+            base_type = self.geodata_response[ancestor_row]['baseType']
+            if base_type == 'venue':
+                venue_row = ancestor_row
+            elif base_type == 'building':
+                building_row = ancestor_row
+            elif base_type == 'floor':
+                floor_row = ancestor_row
+        self._venue_row[row] = venue_row
+        self._building_row[row] = building_row
+        self._floor_row[row] = floor_row
+
+    #fetches the data again and applies only what changed, instead of building a new GeoFunctions.
+    def refresh(self):
+        """
+        Downloads the latest data and brings this instance up to date with it. Location types, categories and app user
+        roles are replaced, the geodata is diffed and applied with apply_geodata.
+
+        Returns
+        -------
+
+        the change summary from apply_geodata.
+
+        examples
+        -------
+
+        changes = geo_functions.refresh()
+        changes['updated'] --> ['8d9b21b028df40e38f8c52d7']
+        """
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            location_types = pool.submit(self.instance.get_location_types)
+            categories = pool.submit(self.instance.get_categories)
+            app_user_roles = pool.submit(self.instance.get_app_user_roles)
+            changes = self.apply_geodata(self.instance.get_raw_geodata())
+            self._load_metadata(location_types.result(), categories.result(), app_user_roles.result())
+        return changes
+
+    def apply_geodata(self, geodata):
+        """
+        Makes the loaded geodata match a new copy of the /geodata response. Items are matched by id and compared by a hash
+        of their content, then only the inserted, updated and deleted items are written to the store and the indexes.
+        Hashing the new copy is the only work done for every item, the rest grows with the number of changes.
+
+        Rows of unchanged locations stay where they are. A deleted row is filled with the last row, and new items go at
+        the end, so geodata_response can end up in a different order than the response.
+
+        Parameters
+        ----------
+        geodata --> list of geodata dicts, or any iterable of them
+
+        Returns
+        -------
+
+        dict with 'inserted', 'updated' and 'deleted' lists of ids and the number of 'unchanged' locations.
+        """
+        if self.store.read_only:
+            raise TypeError('this GeoFunctions was opened from a geodata file and is read only. write a new file instead')
+        if self._row_hashes is None:
+            self._row_hashes = [item_hash(item) for item in self.geodata_response]
+        new_items = {item['id']: item for item in geodata}
+        deleted = [location_id for location_id in self._row_by_id if location_id not in new_items]
+        inserted = []
+        updated = []
+        for location_id, item in new_items.items():
+            row = self._row_by_id.get(location_id)
+            if row is None:
+                inserted.append((location_id, item, item_hash(item)))
+                continue
+            digest = item_hash(item)
+            if digest != self._row_hashes[row]:
+                updated.append((location_id, item, digest))
+
+        # ids whose position in the tree may have changed.  they get their ancestors recomputed together with everything below them
+        moved_ids = set()
+        # parents whose children changed.  their spatial indexes are rebuilt on next use
+        changed_parents = set()
+        per_row_lists = (self._parent_row, self._ancestor_rows, self._venue_row, self._building_row, self._floor_row, self._row_hashes)
+
+        for location_id in deleted:
+            row = self._row_by_id[location_id]
+            item = self.geodata_response[row]
+            changed_parents.add(item.get('parentId'))
+            moved_ids.update(self.geodata_response[child_row]['id'] for child_row in self._child_rows.get(location_id, []))
+            self._remove_row_from_indexes(row, item)
+            last = len(self.geodata_response) - 1
+            if row != last:
+                last_item = self.geodata_response[last]
+                self._remove_row_from_indexes(last, last_item)
+                self.store.delete(row)
+                self._add_row_to_indexes(row, last_item)
+                for values in per_row_lists:
+                    values[row] = values[last]
+                moved_ids.add(last_item['id'])
+                changed_parents.add(last_item.get('parentId'))
+            else:
+                self.store.delete(row)
+            for values in per_row_lists:
+                values.pop()
+
+        for location_id, item, digest in updated:
+            row = self._row_by_id[location_id]
+            old_item = self.geodata_response[row]
+            self._remove_row_from_indexes(row, old_item)
+            self.store.update(row, item)
+            self._add_row_to_indexes(row, item)
+            self._row_hashes[row] = digest
+            changed_parents.update((old_item.get('parentId'), item.get('parentId')))
+            if old_item.get('parentId') != item.get('parentId') or old_item['baseType'] != item['baseType']:
+                moved_ids.add(location_id)
+
+        for location_id, item, digest in inserted:
+            row = self.store.append(item)
+            for values in per_row_lists:
+                values.append(None)
+            self._row_hashes[row] = digest
+            self._add_row_to_indexes(row, item)
+            changed_parents.add(item.get('parentId'))
+            moved_ids.add(location_id)
+
+        self._update_ancestry(moved_ids)
+        for parent_id in changed_parents:
+            self._polygon_index.pop(parent_id, None)
+        if deleted or inserted or updated:
+            for key in [key for key in self._nearest_candidates if key[0] is None or key[0] in changed_parents]:
+                del self._nearest_candidates[key]
+        return {
+            'inserted': [location_id for location_id, _, _ in inserted],
+            'updated': [location_id for location_id, _, _ in updated],
+            'deleted': deleted,
+            'unchanged': len(new_items) - len(inserted) - len(updated),
+        }
+
+    def _add_row_to_indexes(self, row, item):
+        for index, key in self._index_entries(item):
+            insort(index.setdefault(key, []), row)
+
+    def _remove_row_from_indexes(self, row, item):
+        for index, key in self._index_entries(item):
+            rows = index[key]
+            del rows[bisect_left(rows, row)]
+            if not rows:
+                del index[key]
+
+    def _update_ancestry(self, location_ids):
+        """
+        Recomputes _parent_row, _ancestor_rows and the venue/building/floor rows for the given locations and everything
+        below them, parents before children.
+        """
+        rows = set()
+        stack = [self._row_by_id[location_id] for location_id in location_ids if location_id in self._row_by_id]
+        while stack:
+            row = stack.pop()
+            if row in rows:
+                continue
+            rows.add(row)
+            stack.extend(self._child_rows.get(self.geodata_response[row]['id'], []))
+
+        done = set()
+        for row in rows:
+            path = []
+            current = row
+            while current in rows and current not in done and current not in path:
+                path.append(current)
+                parent_id = self.geodata_response[current].get('parentId')
+                current = None if parent_id is None else self._row_by_id.get(parent_id)
+            for path_row in reversed(path):
+                self._set_ancestry(path_row)
+                done.add(path_row)
+
+    def _set_ancestry(self, row):
+        parent_id = self.geodata_response[row].get('parentId')
+        parent_row = None if parent_id is None else self._row_by_id.get(parent_id)
+        parent_ancestors = None if parent_row is None else self._ancestor_rows[parent_row]
+        self._parent_row[row] = parent_row
+        if parent_ancestors is None or parent_row == row or row in parent_ancestors:
+            self._ancestor_rows[row] = ()
+        else:
+            self._ancestor_rows[row] = (parent_row,) + parent_ancestors
+        self._set_levels(row)
+
+    def _anchor_coordinates_for(self, location_ids):
+        """
+        [lon, lat] array for a list of location ids. ids that don't exist give NaN.
+        """
+        rows = np.fromiter((self._row_by_id.get(location_id, -1) for location_id in location_ids), dtype=np.int64)
+        coordinates = np.full((len(rows), 2), np.nan)
+        found = rows >= 0
+        coordinates[found] = self.store.anchors[rows[found]]
+        return coordinates
+
+    def _rows_to_locations(self, rows, json:bool=False):
+        if json == True:
+            return [self.geodata_response[row] for row in rows]
+        return [self.geodata_objects[row] for row in rows]
+
 
     #returns a specific location, and creates an object to be used in dot notation.  e.g. location.id instead of location['id']
     def get_location(self, location_id:str, json:bool=False):
@@ -60,12 +488,40 @@ class GeoFunctions:
         get_location('a4394d6ec46d4060888652cb', json=False)
         get_location('a4394d6ec46d4060888652cb', json=True)
         """
-        for item in self.geodata_response:
-            if item['id'] == location_id:
-                if json == False:
-                    return(Geodata(item))
-                elif json == True:
-                    return(item)
+        row = self._row_by_id.get(location_id)
+        if row is None:
+            return None
+        if json == False:
+            return self.geodata_objects[row]
+        elif json == True:
+            return self.geodata_response[row]
+
+    def get_locations(self, location_ids, json:bool=False):
+        """
+        Gets many locations at once based on the MapsIndoors internal Id.
+
+        Parameters
+        ----------
+        location_ids --> iterable of strings
+        json --> specifies to return objects or json dicts (default --> object)
+
+        Returns
+        -------
+
+        list of locations in the same order as location_ids. ids that don't exist give None in their place.
+
+        examples
+        -------
+
+        get_locations(['a4394d6ec46d4060888652cb', '3dbe1a2e7c364732a2ae6cb1'])
+        get_locations(['a4394d6ec46d4060888652cb', '3dbe1a2e7c364732a2ae6cb1'], json=True)
+        """
+        locations = self.geodata_response if json == True else self.geodata_objects
+        locations_list = []
+        for location_id in location_ids:
+            row = self._row_by_id.get(location_id)
+            locations_list.append(None if row is None else locations[row])
+        return locations_list
 
     def get_location_by_external_id(self, external_id:str, json:bool=False):
         """
@@ -90,17 +546,8 @@ class GeoFunctions:
         """
 
         self.external_id = external_id
-        locations = []
-        for i in self.geodata_response:
-            try:
-                 if i['externalId'].lower() == external_id.lower():
-                    if json == False:
-                        locations.append(Geodata(i))
-                    elif json == True:
-                        locations.append(i)
-            except KeyError:
-                continue
-        return locations
+        rows = self._rows_by_external_id.get(external_id.casefold(), [])
+        return self._rows_to_locations(rows, json)
 
     def get_user_role_name_by_id(self, user_role_id:str, language_symbol:str):
         for item in self.app_user_roles:
@@ -133,19 +580,8 @@ class GeoFunctions:
         get_location_by_alias('1.07.01a', json=True)
         """
         self.alias = alias.upper()
-        locations = []
-        for i in self.geodata_response:
-            try:
-                if i['aliases'] != []:
-                    for item in i['aliases']:
-                        if item.upper() == alias.upper():
-                            if json == False:
-                                locations.append(Geodata(i))
-                            elif json == True:
-                                locations.append(i)
-            except KeyError:
-                continue
-        return locations
+        rows = self._rows_by_alias.get(alias.casefold(), [])
+        return self._rows_to_locations(rows, json)
 
     #because the items in the geodata response only contain a location type id (display type id), it's useful to get the id from the name.  this value is not actually visible in the CMS at all.
     def get_location_type_id(self, location_type_name:str):
@@ -217,15 +653,9 @@ class GeoFunctions:
         get_locations_by_display_type_id('a0c8d3faff9a406c977592f0')
         get_locations_by_display_type_id('a0c8d3faff9a406c977592f0', json=True)
         """
-        display_type_locations_list = []
         self.location_type_id = location_type_id
-        for item in self.geodata_response:
-            if item['baseType'] not in ('venue', 'building', 'floor') and item['displayTypeId'] == location_type_id:
-                if json == False:
-                    display_type_locations_list.append(Geodata(item))
-                elif json == True:
-                    display_type_locations_list.append(item)
-        return display_type_locations_list
+        rows = self._rows_by_display_type_id.get(location_type_id, [])
+        return self._rows_to_locations(rows, json)
 
     #items in the geodata contain only a category id. if you know the category key this can fetch the id.
     def get_category_id(self, category_name:str, language_symbol:str):
@@ -326,16 +756,8 @@ class GeoFunctions:
         get_buildings_in_venue('b8ce325e29444d76a32fbf55', json=False)
         get_buildings_in_venue('b8ce325e29444d76a32fbf55', json=True)
         """
-        locations_list = []
-        venue_child_objects = self.get_child_objects(venue_id)
-        for item in venue_child_objects:
-            if item['baseType'] == 'building':
-                if json == False:
-                    item = Geodata(item)
-                    locations_list.append(item)
-                elif json == True:
-                    locations_list.append(item)
-        return locations_list
+        rows = [row for row in self._child_rows.get(venue_id, []) if self.geodata_response[row]['baseType'] == 'building']
+        return self._rows_to_locations(rows, json)
 
     #this will get only the outside poi and areas for a particular venue.
     def get_outside_poi_and_area(self, venue_id, json:bool=False):
@@ -360,26 +782,13 @@ class GeoFunctions:
         get_outside_poi_and_area('b8ce325e29444d76a32fbf55', json=True)
         
         """
-        locations_list = []
-        venue_child_objects = self.get_child_objects(venue_id)
-        for item in venue_child_objects:
-            if item['baseType'] == 'poi' or item['baseType'] == 'area':
-                if json == False:
-                    item = Geodata(item)
-                    locations_list.append(item)
-                elif json == True:
-                    locations_list.append(item)
-        return locations_list
+        rows = [row for row in self._child_rows.get(venue_id, []) if self.geodata_response[row]['baseType'] in ('poi', 'area')]
+        return self._rows_to_locations(rows, json)
 
     #gets all floors in a building.  can also use get_child_objects method on a building id for the same result.
     def get_floors_in_building(self, building_id):
-        locations_list = []
-        building_child_objects = self.get_child_objects(building_id)
-        for item in building_child_objects:
-            if item['baseType'] == 'floor':
-                item = Geodata(item)
-                locations_list.append(item)
-        return locations_list
+        rows = [row for row in self._child_rows.get(building_id, []) if self.geodata_response[row]['baseType'] == 'floor']
+        return self._rows_to_locations(rows)
 
 
 
@@ -403,19 +812,131 @@ class GeoFunctions:
         get_location_venue_id('3dbe1a2e7c364732a2ae6cb1')
 
         """
-        for item in self.geodata_response:
-            if item['id'] == location_id:
-                item = Geodata(item)
-                try:
-                    direct_parent = self.get_location(item.parentId)
-                    if direct_parent.baseType == 'floor':
-                        building = self.get_location(direct_parent.parentId)
-                        venue = self.get_location(building.parentId)
-                        return venue.id
-                    elif direct_parent.baseType == 'venue':
-                        return direct_parent.id
-                except AttributeError:
-                    return 'Cannot use a venue id.'
+        row = self._row_by_id.get(location_id)
+        if row is None:
+            return None
+        if self.geodata_response[row]['baseType'] == 'venue':
+            return 'Cannot use a venue id.'
+        venue_row = self._venue_row[row]
+        if venue_row is not None:
+            return self.geodata_response[venue_row]['id']
+
+    def get_location_building_id(self, location_id):
+        """
+        Gets the building id of a location. Locations outside of a building return None.
+
+        Parameters
+        ----------
+        location_id --> mapsindoors location id
+
+        Returns
+        -------
+
+        returns a building 'id'
+
+        examples
+        -------
+
+        get_location_building_id('3dbe1a2e7c364732a2ae6cb1')
+
+        """
+        row = self._row_by_id.get(location_id)
+        if row is not None and self._building_row[row] is not None:
+            return self.geodata_response[self._building_row[row]]['id']
+
+    def get_location_floor_id(self, location_id):
+        """
+        Gets the floor id of a location. Locations outside of a building return None.
+
+        Parameters
+        ----------
+        location_id --> mapsindoors location id
+
+        Returns
+        -------
+
+        returns a floor 'id'
+
+        examples
+        -------
+
+        get_location_floor_id('3dbe1a2e7c364732a2ae6cb1')
+
+        """
+        row = self._row_by_id.get(location_id)
+        if row is not None and self._floor_row[row] is not None:
+            return self.geodata_response[self._floor_row[row]]['id']
+
+    def get_ancestors(self, location_id:str, json:bool=False):
+        """
+        Gets the chain of parents of a location, starting with the direct parent and ending at the venue.
+
+        Parameters
+        ----------
+        location_id --> mapsindoors internal id.
+        json --> True returns json items, False returns geodata objects.  False is default
+
+        Returns
+        -------
+
+        returns a list of locations. empty if the location has no parent in the geodata.
+
+        examples
+        -------
+
+        get_ancestors('3dbe1a2e7c364732a2ae6cb1')
+
+        """
+        row = self._row_by_id.get(location_id)
+        if row is None:
+            return []
+        return self._rows_to_locations(self._ancestor_rows[row], json)
+
+    def iter_subtree(self, location_id:str, json:bool=True):
+        """
+        Walks every location below location_id (children, grandchildren, etc.) depth first, one location at a time.
+        Use this instead of get_subtree when the whole list isn't needed.
+
+        Parameters
+        ----------
+        location_id --> mapsindoors internal id. usually a venue, building or floor.
+        json --> True yields json items, False yields geodata objects.  True is default
+
+        Returns
+        -------
+
+        generator of locations. location_id itself is not included.
+
+        examples
+        -------
+
+        for location in iter_subtree('77eac43db1094a40add4f0b6'):
+            print(location['id'])
+
+        """
+        locations = self.geodata_response if json == True else self.geodata_objects
+        stack = [iter(self._child_rows.get(location_id, []))]
+        while stack:
+            row = next(stack[-1], None)
+            if row is None:
+                stack.pop()
+                continue
+            yield locations[row]
+            stack.append(iter(self._child_rows.get(self.geodata_response[row]['id'], [])))
+
+    def get_subtree(self, location_id:str, json:bool=True):
+        """
+        Same as iter_subtree but returns a list.
+
+        examples
+        -------
+
+        get_subtree('77eac43db1094a40add4f0b6')
+        get_subtree('77eac43db1094a40add4f0b6', json=False)
+
+        """
+        return list(self.iter_subtree(location_id, json))
+
                 
 
     def get_child_objects(self, location_id:str, json:bool=True):
@@ -439,18 +960,7 @@ class GeoFunctions:
         get_child_objects('77eac43db1094a40add4f0b6')
 
         """
-        child_object_list = []
-        for item in self.geodata_response:
-                try:
-                    if item['parentId'] == location_id:
-                        if json == True:
-                            child_object_list.append(item)
-                        if json == False:
-                            item = Geodata(item)
-                            child_object_list.append(item)
-                except KeyError:
-                    continue
-        return child_object_list
+        return self._rows_to_locations(self._child_rows.get(location_id, []), json)
 
 
 
@@ -525,6 +1035,136 @@ class GeoFunctions:
             return 'One or more locations does not exist.'
 
 
+    def get_distances(self, location_id:str, location_ids, unit:str='feet'):
+        """
+        returns the distances from one location to many locations.  same as calling get_distance for every pair, but done in one numpy pass.
+
+        Parameters
+        ----------
+        location_id --> mapsindoors id of location
+        location_ids --> list of mapsindoors ids
+        unit --> 'meters' or 'feet'
+
+        Returns
+        -------
+
+        returns a float numpy array with one distance per id in location_ids. NaN where a location does not exist or has no anchor.
+
+        examples
+        -------
+
+        get_distances('8d9b21b028df40e38f8c52d7', ['7c841c82151247978dde13d9', 'a4394d6ec46d4060888652cb'], unit='meters')
+
+        """
+        return self.get_distance_matrix([location_id], location_ids, unit=unit)[0]
+
+    def get_distance_matrix(self, location_ids_1, location_ids_2, unit:str='feet', chunk_size:int=1000000):
+        """
+        returns the distance between every location in location_ids_1 and every location in location_ids_2.  uses the anchor points like get_distance.
+
+        Parameters
+        ----------
+        location_ids_1 --> list of mapsindoors ids (rows of the result)
+        location_ids_2 --> list of mapsindoors ids (columns of the result)
+        unit --> 'meters' or 'feet'
+        chunk_size --> max number of pairs computed at once. keeps the temporary arrays small for big inputs.
+
+        Returns
+        -------
+
+        returns a float numpy array of shape (len(location_ids_1), len(location_ids_2)). NaN where a location does not exist or has no anchor.
+
+        examples
+        -------
+
+        rooms = [room['id'] for room in get_child_objects('77eac43db1094a40add4f0b6')]
+        get_distance_matrix(rooms, rooms, unit='meters')
+
+        """
+        if unit == 'meters':
+            factor = 1.0
+        elif unit == 'feet':
+            factor = 3.28084
+        else:
+            raise ValueError("unit must be 'meters' or 'feet'")
+        coordinates_1 = self._anchor_coordinates_for(location_ids_1)
+        coordinates_2 = self._anchor_coordinates_for(location_ids_2)
+        distances = np.empty((len(coordinates_1), len(coordinates_2)))
+        if distances.size == 0:
+            return distances
+        lon2 = coordinates_2[:, 0][np.newaxis, :]
+        lat2 = coordinates_2[:, 1][np.newaxis, :]
+        rows_per_chunk = max(1, chunk_size // len(coordinates_2))
+        for start in range(0, len(coordinates_1), rows_per_chunk):
+            chunk = coordinates_1[start:start + rows_per_chunk]
+            distances[start:start + len(chunk)] = haversine_np(chunk[:, 0][:, np.newaxis], chunk[:, 1][:, np.newaxis], lon2, lat2)
+        if factor != 1.0:
+            distances *= factor
+        return distances
+
+
+    def nearest(self, location_id:str, k:int=1, display_type:str=None, category:str=None, same_floor:bool=True, max_distance:float=None, json:bool=False):
+        """
+        returns the k closest locations (poi/area/room) to a location, measured between anchor points like get_distance.
+
+        Parameters
+        ----------
+        location_id --> mapsindoors id of location
+        k --> number of locations to return
+        display_type --> optional. only return locations of this location type. takes the name (e.g. 'meeting room') or the displayTypeId
+        category --> optional. only return locations with this category id
+        same_floor --> True only looks at locations with the same parent (the same floor, or the venue for outside locations). False searches the whole solution
+        max_distance --> optional. only return locations within this many meters. the search stops at that distance instead of going on until k are found
+        json --> specifies to return objects or json dicts (default --> object)
+
+        Returns
+        -------
+
+        returns a list of up to k locations, closest first. location_id itself is never part of the result.
+
+        examples
+        -------
+
+        nearest('8d9b21b028df40e38f8c52d7', k=5, display_type='meeting room')
+        nearest('8d9b21b028df40e38f8c52d7', k=3, category='105241f501d940b4af1aede8', same_floor=False, json=True)
+        nearest('8d9b21b028df40e38f8c52d7', k=10, same_floor=False, max_distance=50)
+
+        """
+        row = self._row_by_id.get(location_id)
+        if row is None or k < 1:
+            return []
+        display_type_id = None
+        if display_type is not None:
+            display_type_id = self.get_location_type_id(display_type) or display_type
+        parent_id = self.geodata_response[row].get('parentId') if same_floor == True else None
+        candidate_rows, index = self._get_nearest_candidates(parent_id, display_type_id, category)
+        if len(candidate_rows) == 0:
+            return []
+        lon, lat = np.radians(self.store.anchors[row])
+        exclude = np.searchsorted(candidate_rows, row)
+        exclude = int(exclude) if exclude < len(candidate_rows) and candidate_rows[exclude] == row else None
+        max_angle = None if max_distance is None else max_distance / EARTH_RADIUS_METERS
+        closest, _ = index.query(lon, lat, k, max_angle=max_angle, exclude=exclude)
+        return self._rows_to_locations(candidate_rows[closest].tolist(), json)
+
+    def _get_nearest_candidates(self, parent_id, display_type_id, category_id):
+        """
+        Rows of the poi/area/room locations with an anchor that match the filters, in ascending order, and a PointIndex
+        over their anchors. parent_id None means the whole solution.
+        Each filter combination is built once and kept, so repeated nearest() calls only query the index.
+        """
+        key = (parent_id, display_type_id, category_id)
+        candidates = self._nearest_candidates.get(key)
+        if candidates is None:
+            candidate_rows = self.store.filter_rows(base_type=('poi', 'area', 'room'), display_type_id=display_type_id, parent_id=parent_id)
+            candidate_rows = np.sort(candidate_rows[~np.isnan(self.store.anchors[candidate_rows, 0])])
+            if category_id is not None:
+                candidate_rows = np.array([row for row in candidate_rows.tolist() if category_id in (self.geodata_response[row].get('categories') or [])], dtype=np.int64)
+            lon, lat = np.radians(self.store.anchors[candidate_rows]).reshape(-1, 2).T
+            candidates = (candidate_rows, PointIndex(lon, lat))
+            self._nearest_candidates[key] = candidates
+        return candidates
+
     
     def get_polygons(self, json:bool=True):
         """
@@ -548,15 +1188,9 @@ class GeoFunctions:
         get_polygons(json=False)
         
         """
-        polygon_list = []
-        geodata = self.geodata_response
-        for item in geodata:
-            if item['baseType'] == 'area' or item['baseType'] == 'room':
-                if json == True:
-                    polygon_list.append(item)
-                elif json == False:
-                    polygon_list.append(Geodata(item))
-        return polygon_list
+        rows = self._rows_by_base_type.get('area', []) + self._rows_by_base_type.get('room', [])
+        rows.sort()
+        return self._rows_to_locations(rows, json)
     
     def get_venues(self, json:bool=True):
         """
@@ -579,14 +1213,36 @@ class GeoFunctions:
         get_venues(json=False)
         
         """
-        venue_list = []
-        for item in self.geodata_response:
-            if item['baseType'] == 'venue':
-                if json == True:
-                    venue_list.append(item)
-                elif json == False:
-                    venue_list.append(Geodata(item))
-        return venue_list
+        return self._rows_to_locations(self._rows_by_base_type.get('venue', []), json)
+
+    def filter_locations(self, base_type=None, status=None, display_type_id=None, parent_id=None, bbox=None, json:bool=False):
+        """
+        filters all geodata on the columnar store. every filter is optional and they are combined, so only locations matching all of them are returned.
+
+        Parameters
+        ----------
+        base_type --> a baseType or a list of baseTypes. e.g. 'room' or ['room', 'area']
+        status --> a status value or a list of values. e.g. 3 for active and searchable
+        display_type_id --> a location type id or a list of them
+        parent_id --> a parent id or a list of them. e.g. a floor id
+        bbox --> [min_lon, min_lat, max_lon, max_lat]. keeps locations whose bounding box overlaps it
+        json --> True or False.  Default is False
+
+        Returns
+        -------
+
+        Returns a list of locations as geodata objects or json specified by the json boolean parameter.
+
+        examples
+        -------
+
+        filter_locations(base_type='poi', status=3)
+        filter_locations(base_type=['room', 'area'], parent_id='77eac43db1094a40add4f0b6', json=True)
+        filter_locations(bbox=[9.9501, 57.0578, 9.9511, 57.0583])
+
+        """
+        rows = self.store.filter_rows(base_type=base_type, status=status, display_type_id=display_type_id, parent_id=parent_id, bbox=bbox)
+        return self._rows_to_locations(rows.tolist(), json)
 
     def get_location_floor_index(self, location_id):
         """
@@ -610,63 +1266,130 @@ class GeoFunctions:
         
         """
         self.location_id = location_id
-        location = self.get_location(self.location_id)
-        if location.baseType == 'room' or location.baseType == 'area' or location.baseType == 'poi':
-            parent_object = self.get_location(location.parentId)
-        else:
+        row = self._row_by_id[location_id]
+        if self.geodata_response[row]['baseType'] not in ('room', 'area', 'poi'):
             return "Location is not one the following baseType: 'area', 'poi', 'room'"
-        if parent_object.baseType == 'floor':
-            return parent_object.baseTypeProperties.administrativeid
-        elif location.baseType == 'venue':
-            return 'Location is not inside of building polygon. Parent is venue.'
+        parent_row = self._parent_row[row]
+        if parent_row is not None and self.geodata_response[parent_row]['baseType'] == 'floor':
+            return self.geodata_response[parent_row]['baseTypeProperties']['administrativeid']
+        return 'Location is not inside of building polygon. Parent is venue.'
 
 
 
     def geodesic_point_buffer(self, lat, lon, m):
-        proj_wgs84 = pyproj.Proj('+proj=longlat +datum=WGS84')
-        aeqd_proj = '+proj=aeqd +lat_0={lat} +lon_0={lon} +x_0=0 +y_0=0'
-        project = partial(
-            pyproj.transform,
-            pyproj.Proj(aeqd_proj.format(lat=lat, lon=lon)),
-            proj_wgs84)
-        buf = Point(0, 0).buffer(m)  # distance in meters
-        circle = transform(project, buf).exterior.coords[:]
-        circle = circle[0:-1]
-        return [list(x) for x in circle]
+        """
+        circle of radius m meters around a point, as a list of 64 [lon, lat] pairs (not closed).  see geodesic_point_buffers.
+        """
+        return geodesic_point_buffers_np(lat, lon, m)[0].tolist()
+
+    def geodesic_point_buffers(self, lats, lons, m, resolution:int=16):
+        """
+        geodesic_point_buffer for many points in one call.  every vertex of every ring is solved in one pyproj.Geod call, so
+        thousands of anchors cost about as much as a few single calls.  the vertices are the ones the original per-point
+        aeqd projection of a shapely buffer gave, to within a micrometer.
+
+        Parameters
+        ----------
+        lats, lons --> latitudes and longitudes of the centres
+        m --> radius in meters, one for all or one per centre
+        resolution --> segments per quarter circle.  16 gives the 64 points of geodesic_point_buffer
+
+        Returns
+        -------
+
+        numpy array of shape (number of centres, 4 * resolution, 2) holding [lon, lat] rings.
+
+        examples
+        -------
+
+        anchors = np.array([location['anchor']['coordinates'] for location in geo_functions.geodata_response if 'anchor' in location])
+        geodesic_point_buffers(anchors[:, 1], anchors[:, 0], 25)
+        """
+        return geodesic_point_buffers_np(lats, lons, m, resolution)
 
 
     def bounding_box(self, points):
         """
-        used in the circle functions
+        used in the circle functions.  returns [min_x, min_y, max_x, max_y] of a list of [x, y] points (or an (N, 2) array)
         """
-        bot_left_x = min(point[0] for point in points)
-        bot_left_y = min(point[1] for point in points)
-        top_right_x = max(point[0] for point in points)
-        top_right_y = max(point[1] for point in points)
-        return list(eval((re.sub(r"\((.*?)\)", r"\1", str([(bot_left_x, bot_left_y), (top_right_x, top_right_y)])[1:-1]))))
+        points = np.asarray(points, dtype=np.float64)
+        min_x, min_y = points[:, :2].min(axis=0).tolist()
+        max_x, max_y = points[:, :2].max(axis=0).tolist()
+        return [min_x, min_y, max_x, max_y]
 
 
     def get_areas_within_radius(self, location_id, radius_meters):
         new_location = self.get_location(location_id)
-        define_radius_of_location = self.geodesic_point_buffer(new_location.anchor.coordinates[1], new_location.anchor.coordinates[0], radius_meters)
-        targeted_area_list_tuples = list(tuple(x) for x in define_radius_of_location)
-        targeted_area = Polygon(targeted_area_list_tuples)
-        venue_id_list = []
-        venues = self.get_venues()
-        for item in venues:
-            venue_id_list.append(item['id'])
+        define_radius_of_location = geodesic_point_buffers_np(new_location.anchor.coordinates[1], new_location.anchor.coordinates[0], radius_meters)[0]
+        targeted_area = Polygon(define_radius_of_location)
+        targeted_bbox = self.bounding_box(define_radius_of_location)
+        # rooms/areas on the same floor as the location, plus anything placed directly on a venue (outside areas)
+        parent_ids = {self.geodata_response[row]['id'] for row in self._rows_by_base_type.get('venue', [])}
+        parent_ids.add(new_location.parentId)
+        rows = []
+        for parent_id in parent_ids:
+            rows.extend(self._query_polygon_index(parent_id, targeted_area, targeted_bbox))
+        rows.sort()
         parent_list = []
-        polygon_list = self.get_polygons()
-        for item in polygon_list:
-            if (item['parentId'] == new_location.parentId) or (item['parentId'] in venue_id_list):
-                polygon_shape = (item['geometry']['coordinates'][0][:-1])
-                shapely_polygon_area = self.convert_polygon_to_shapely_polygon(polygon_shape)
-                if targeted_area.intersects(shapely_polygon_area) == True:
-                    parent_list.append(f"{item['id']}, {item['properties']['name@en']}")
-        else:
-            pass
+        for row in rows:
+            item = self.geodata_response[row]
+            parent_list.append(f"{item['id']}, {item['properties']['name@en']}")
         return parent_list
 
+    def _get_polygon_index(self, parent_id):
+        """
+        The rooms and areas whose parentId is parent_id, with their bounding boxes from store.bbox. Built the first time a
+        parent is queried and kept afterwards.
+        Returns (rows, boxes, prepared_polygons, tree, positions): an int array of rows, their (N, 4) boxes, a dict
+        row --> prepared polygon that is filled as rows pass the bbox test (so polygons that are never near a query are
+        never built), and for parents with at least POLYGON_TREE_MIN_ROWS rows an STRtree over the boxes. positions maps
+        id(box) to its position in rows, for shapely 1.8 whose STRtree returns the boxes instead of positions.
+        """
+        index = self._polygon_index.get(parent_id)
+        if index is None:
+            rows = np.array(self._child_rows.get(parent_id, []), dtype=np.int64)
+            rows = rows[np.isin(self.store.base_type[rows], [BASE_TYPE_CODES['area'], BASE_TYPE_CODES['room']])]
+            # rows without a geometry have NaN boxes and can never match
+            rows = rows[~np.isnan(self.store.bbox[rows, 0])]
+            boxes = np.ascontiguousarray(self.store.bbox[rows])
+            tree = positions = None
+            if len(rows) >= POLYGON_TREE_MIN_ROWS:
+                box_geometries = [box(*bounds) for bounds in boxes.tolist()]
+                tree = STRtree(box_geometries)
+                positions = {id(geometry): position for position, geometry in enumerate(box_geometries)}
+            index = (rows, boxes, {}, tree, positions)
+            self._polygon_index[parent_id] = index
+        return index
+
+    def _query_polygon_index(self, parent_id, geometry, bbox):
+        """
+        Returns the rows of the rooms/areas under parent_id that intersect geometry, whose bounding box is bbox.
+        The bbox test drops everything that can't intersect and the prepared polygons do the exact test on what's left.
+        Small parents are tested with one vectorized bbox overlap over all their rows, O(rooms under the parent) per query
+        but faster than a tree at that size. Parents with POLYGON_TREE_MIN_ROWS rows or more ask their STRtree, so the cost
+        grows with the number of boxes near the query instead of with the number of rooms.
+        """
+        rows, boxes, prepared_polygons, tree, positions = self._get_polygon_index(parent_id)
+        if tree is None:
+            candidates = rows[bbox_overlaps(boxes, bbox)].tolist()
+        else:
+            found = tree.query(box(*bbox))
+            if isinstance(found, np.ndarray) and found.dtype.kind == 'i':
+                # shapely 2 returns positions
+                candidate_positions = np.sort(found)
+            else:
+                # shapely 1.8 returns the boxes themselves
+                candidate_positions = sorted(positions[id(candidate)] for candidate in found)
+            candidates = rows[candidate_positions].tolist()
+        result = []
+        for row in candidates:
+            polygon = prepared_polygons.get(row)
+            if polygon is None:
+                polygon = prepared_polygons[row] = prep(Polygon(self.store.exterior_ring(row)[:-1]))
+            if polygon.intersects(geometry):
+                result.append(row)
+        return result
+
     def convert_polygon_to_shapely_polygon(self, polygon_coordinates_list_of_lists):
         self.area_coordinates_tuples = list(tuple(x) for x in polygon_coordinates_list_of_lists)
         area_shapely = Polygon(self.area_coordinates_tuples)
@@ -1,7 +1,19 @@
 import json
 from mapsindoors.integration_api_instance import *
 
+def _raw_field(key):
+	"""read only attribute that returns geodata[key]. raises AttributeError when the key isn't in the dict"""
+	def getter(self):
+		try:
+			return self.geodata[key]
+		except KeyError:
+			raise AttributeError(key) from None
+	return property(getter)
+
+
 class Geodata:
+	__slots__ = ('geodata', '_displaySetting', '_geometry', '_anchor', '_baseTypeProperties', '_props', '_properties')
+
 	def __init__(self, json_dict):
 		"""
 		class properties
@@ -59,76 +71,83 @@ As this is a dictionary setup, the keyname needs to be unique and only contain t
 
 		"""
 		self.geodata = json_dict
-		self.id = json_dict['id']
 
-		
+	# plain fields are read straight from the dict.  geometry, anchor, baseTypeProperties, props/properties and displaySetting are
+	# parsed the first time they are used and then kept in their slot.  a missing key raises AttributeError, same as an attribute that was never set.
+
+	id = _raw_field('id')
+	parentId = _raw_field('parentId')
+	datasetId = _raw_field('datasetId')
+	externalId = _raw_field('externalId')
+	baseType = _raw_field('baseType')
+	displayTypeId = _raw_field('displayTypeId')
+	aliases = _raw_field('aliases')
+	categories = _raw_field('categories')
+	tileStyles = _raw_field('tileStyles')
+	tilesUrl = _raw_field('tilesUrl')
+	status = _raw_field('status')
+
+	@property
+	def displaySetting(self):
 		try:
-			self.parentId = json_dict['parentId']
-		except KeyError:
-			pass
-		
-		self.datasetId = json_dict['datasetId']
-		
-		try:
-			self.externalId = json_dict['externalId']
-		except KeyError:
+			return self._displaySetting
+		except AttributeError:
 			pass
-		
-		self.baseType = json_dict['baseType']
-		
 		try:
-			self.displayTypeId = json_dict['displayTypeId']
-		except KeyError:
-			pass
+			self._displaySetting = GeodataField(self.geodata['displaySetting'])
+		except (KeyError, AttributeError):
+			raise AttributeError('displaySetting') from None
+		return self._displaySetting
 
+	@property
+	def geometry(self):
 		try:
-			self.displaySetting = GeodataField(json_dict['displaySetting'])
-		except KeyError:
-			pass
+			return self._geometry
 		except AttributeError:
-			pass# except 
-		
-		self.geometry = Geometry(json_dict['geometry'])
-		
+			self._geometry = Geometry(self.geodata['geometry'])
+			return self._geometry
+
+	@property
+	def anchor(self):
 		try:
-			self.anchor = Anchor(json_dict['anchor'])
-		except KeyError:
+			return self._anchor
+		except AttributeError:
 			pass
-		
 		try:
-			self.aliases = json_dict['aliases']
+			self._anchor = Anchor(self.geodata['anchor'])
 		except KeyError:
-			pass
+			raise AttributeError('anchor') from None
+		return self._anchor
 
+	@property
+	def baseTypeProperties(self):
 		try:
-			self.categories = json_dict['categories']
-		except KeyError:
-			pass
+			return self._baseTypeProperties
+		except AttributeError:
+			self._baseTypeProperties = BaseTypeProperties(self.geodata['baseTypeProperties'])
+			return self._baseTypeProperties
 
+	@property
+	def props(self):
 		try:
-			self.tileStyles = json_dict['tileStyles']
-		except KeyError:
-			pass
+			return self._props
+		except AttributeError:
+			self._props = Properties(self.geodata['properties'])
+			return self._props
 
+	@property
+	def properties(self):
 		try:
-			self.tilesUrl = json_dict['tilesUrl']
-		except KeyError:
-			pass
-		
-		self.status = json_dict['status']
-		
-		self.baseTypeProperties = BaseTypeProperties(json_dict['baseTypeProperties'])
-
-		# self.properties = json_dict['properties']
-
-
-		self.props = Properties(json_dict['properties'])
-
-		self.properties = GeodataField(self.props.props)
+			return self._properties
+		except AttributeError:
+			self._properties = GeodataField(self.props.props)
+			return self._properties
 
 
 
 class Geometry:
+	__slots__ = ('coordinates', 'bbox', 'type')
+
 	def __init__(self, geometry_dict):
 		self.coordinates = geometry_dict['coordinates'][0]
 		try:
@@ -138,6 +157,8 @@ class Geometry:
 		self.type = geometry_dict['type']
 
 class BaseTypeProperties:
+	__slots__ = ('defaultfloor', 'name', 'administrativeid', 'graphid', 'capacity', 'Class')
+
 	def __init__(self, baseTypeProperties_dict):
 		try:
 			self.defaultfloor = baseTypeProperties_dict['defaultfloor']
@@ -162,6 +183,8 @@ class BaseTypeProperties:
 			pass
 
 class Anchor:
+	__slots__ = ('coordinates', 'lat', 'lon', 'type')
+
 	def __init__(self, anchorDict):
 		self.coordinates = anchorDict['coordinates']
 		self.lat = anchorDict['coordinates'][1]
@@ -169,6 +192,8 @@ class Anchor:
 		self.type = anchorDict['type']
 
 class Properties:
+	__slots__ = ('props',)
+
 	def __init__(self, properties_dict):
 		self.props = {}
 		# print(propertiesDict)
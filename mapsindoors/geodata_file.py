@@ -0,0 +1,327 @@
+import json
+import mmap
+import os
+import tempfile
+from bisect import bisect_left
+import numpy as np
+from mapsindoors.geodata import *
+from mapsindoors.geodata_store import *
+
+
+MAGIC = b'MIGEODAT'
+VERSION = 1
+#sections start on a multiple of this many bytes, so every column can be viewed in place with the right alignment.
+ALIGNMENT = 64
+
+#GeoFunctions indexes that map a key to a list of rows.  each one is written as sorted keys + offsets into one array of rows.
+ROW_LIST_INDEXES = ('_rows_by_external_id', '_rows_by_alias', '_rows_by_display_type_id', '_rows_by_base_type', '_child_rows')
+#GeoFunctions lists of row --> row or None.  written as int32 columns with -1 for None.
+ROW_COLUMNS = ('_parent_row', '_venue_row', '_building_row', '_floor_row')
+
+
+def write_geodata_file(geo_functions, path):
+    """
+    Writes the loaded data of a GeoFunctions to a flat binary file that open_geodata_file can memory-map.
+
+    Layout: 8 byte magic, 8 byte little endian length of a json header, the header, then the sections, each aligned to
+    ALIGNMENT bytes. The header holds name --> [offset, dtype, shape] for every section, plus the location types,
+    categories, app user roles and the store's string tables, which are small.
+
+    Sections:
+    - the store columns (base_type, status, display_type, parent, anchors, bbox), fixed width, one value per row
+    - the hierarchy columns from ROW_COLUMNS
+    - item_offsets/item_blob: every geodata dict as utf-8 json, the item of row r is item_blob[item_offsets[r]:item_offsets[r + 1]]
+    - ring_offsets/ring_coordinates: the exterior ring of every room and area as float64 [lon, lat] pairs
+    - ids and every index in ROW_LIST_INDEXES: sorted utf-8 keys in a blob with offsets, and the rows per key
+
+    The file is written to a temp file and renamed, so a process that has the old file mapped keeps a valid view of it.
+
+    Parameters
+    ----------
+    geo_functions --> a loaded GeoFunctions
+    path --> file to write
+
+    examples
+    -------
+
+    write_geodata_file(geo_functions, '/srv/geodata/solution.migd')
+    """
+    store = geo_functions.store
+    items = geo_functions.geodata_response
+    sections = {
+        'base_type': store.base_type,
+        'status': store.status,
+        'display_type': store.display_type,
+        'parent': store.parent,
+        'anchors': store.anchors,
+        'bbox': store.bbox,
+    }
+    for name in ROW_COLUMNS:
+        sections[name] = np.array([-1 if row is None else row for row in getattr(geo_functions, name)], dtype=np.int32)
+    sections['item_offsets'], sections['item_blob'] = _blob(json.dumps(item, separators=(',', ':'), ensure_ascii=False).encode() for item in items)
+
+    ring_lengths = np.zeros(len(items), dtype=np.int64)
+    rings = []
+    for row, item in enumerate(items):
+        geometry = item.get('geometry') or {}
+        if item['baseType'] in ('area', 'room') and geometry.get('type') == 'Polygon' and geometry.get('coordinates'):
+            ring = np.asarray(store.exterior_ring(row), dtype=np.float64)[:, :2]
+            ring_lengths[row] = len(ring)
+            rings.append(ring)
+    sections['ring_offsets'] = _offsets(ring_lengths)
+    sections['ring_coordinates'] = np.concatenate(rings) if rings else np.zeros((0, 2))
+
+    ids = sorted((item['id'].encode(), row) for row, item in enumerate(items))
+    sections['id_key_offsets'], sections['id_key_blob'] = _blob(key for key, _ in ids)
+    sections['id_rows'] = np.array([row for _, row in ids], dtype=np.int32)
+    for name in ROW_LIST_INDEXES:
+        index = sorted((key.encode(), rows) for key, rows in getattr(geo_functions, name).items())
+        sections[name + '_key_offsets'], sections[name + '_key_blob'] = _blob(key for key, _ in index)
+        sections[name + '_offsets'] = _offsets([len(rows) for _, rows in index])
+        sections[name + '_rows'] = np.array([row for _, rows in index for row in rows], dtype=np.int32)
+
+    header = {
+        'version': VERSION,
+        'rows': len(items),
+        'location_types': geo_functions.location_types,
+        'categories': geo_functions.categories,
+        'app_user_roles': geo_functions.app_user_roles,
+        'display_type_ids': store.display_type_ids.strings,
+        'parent_ids': store.parent_ids.strings,
+        'sections': {},
+    }
+    offset = 0
+    for name, values in sections.items():
+        values = np.ascontiguousarray(values)
+        sections[name] = values
+        header['sections'][name] = [offset, values.dtype.str, list(values.shape)]
+        offset = _align(offset + values.nbytes)
+    encoded_header = json.dumps(header, separators=(',', ':')).encode()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(MAGIC + len(encoded_header).to_bytes(8, 'little') + encoded_header)
+            data_start = _align(file.tell())
+            for name, values in sections.items():
+                file.seek(data_start + header['sections'][name][0])
+                file.write(values.tobytes())
+            file.truncate(data_start + offset)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def open_geodata_file(path):
+    """
+    Memory-maps a file written by write_geodata_file. Nothing is parsed up front except the header, pages are read from
+    the file when a query touches them. Every process that opens the same file shares those pages through the OS page cache.
+    Usually used through GeoFunctions.from_file.
+    """
+    return GeodataFile(path)
+
+
+class GeodataFile:
+    def __init__(self, path):
+        """
+        A memory-mapped geodata file. store is a read only MappedGeodataStore, the other attributes have the same names
+        and behave like the GeoFunctions indexes they were written from.
+        """
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a geodata file')
+        header_length = int.from_bytes(self._mmap[len(MAGIC):len(MAGIC) + 8], 'little')
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(self._mmap[header_start:header_start + header_length])
+        if self.header['version'] != VERSION:
+            raise ValueError(f"{path} is version {self.header['version']} of the geodata file format, only version {VERSION} can be read")
+        self._data_start = _align(header_start + header_length)
+
+        self.location_types = self.header['location_types']
+        self.categories = self.header['categories']
+        self.app_user_roles = self.header['app_user_roles']
+        self.store = MappedGeodataStore(self)
+        self.row_lists = {name: MappedIndex(self._keys(name), self._view(name + '_rows'), self._view(name + '_offsets')) for name in ROW_LIST_INDEXES}
+        self.row_columns = {name: OptionalRows(self._view(name)) for name in ROW_COLUMNS}
+        self.ancestor_rows = AncestorRows(self._view('_parent_row'))
+
+    def array(self, name):
+        """numpy view of a section. read only, it points straight into the mapped file"""
+        offset, dtype, shape = self.header['sections'][name]
+        count = int(np.prod(shape))
+        return np.frombuffer(self._mmap, dtype=dtype, count=count, offset=self._data_start + offset).reshape(shape)
+
+    def _view(self, name):
+        # memoryviews index much faster than numpy arrays when single values are read from python
+        return memoryview(self.array(name))
+
+    def _keys(self, name):
+        return StringColumn(self._view(name + '_key_offsets'), self._view(name + '_key_blob'))
+
+
+class MappedGeodataStore(GeodataStore):
+    """
+    GeodataStore whose columns, items and id index are views into a GeodataFile. filter_rows, the column properties
+    and reading rows work as usual, anything that changes the store raises TypeError.
+    """
+    read_only = True
+
+    def __init__(self, geodata_file):
+        self.items = MappedItems(geodata_file._view('item_offsets'), geodata_file._view('item_blob'))
+        self.row_by_id = MappedIndex(geodata_file._keys('id'), geodata_file._view('id_rows'))
+        self.display_type_ids = StringTable(geodata_file.header['display_type_ids'])
+        self.parent_ids = StringTable(geodata_file.header['parent_ids'])
+        for name in ('base_type', 'status', 'display_type', 'parent', 'anchors', 'bbox'):
+            setattr(self, '_' + name, geodata_file.array(name))
+        self._capacity = len(self.items)
+        self._ring_offsets = geodata_file._view('ring_offsets')
+        self._ring_coordinates = geodata_file.array('ring_coordinates')
+
+    def append(self, item):
+        raise TypeError('the store is mapped from a geodata file and is read only')
+
+    def update(self, row, item):
+        raise TypeError('the store is mapped from a geodata file and is read only')
+
+    def delete(self, row):
+        raise TypeError('the store is mapped from a geodata file and is read only')
+
+    def copy(self):
+        """a regular, writable GeodataStore with every item decoded from the file"""
+        return GeodataStore.from_items(iter(self.items))
+
+    def exterior_ring(self, row):
+        return self._ring_coordinates[self._ring_offsets[row]:self._ring_offsets[row + 1]]
+
+
+class MappedItems:
+    """read only sequence of the geodata dicts. an item is decoded from its json each time it is read"""
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[position] for position in range(*row.indices(len(self)))]
+        row = range(len(self))[row]
+        return json.loads(self._blob[self._offsets[row]:self._offsets[row + 1]].tobytes())
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+class StringColumn:
+    """read only sequence of byte strings stored back to back in a blob"""
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, position):
+        return self._blob[self._offsets[position]:self._offsets[position + 1]].tobytes()
+
+
+class MappedIndex:
+    """
+    Read only dict replacement over sorted keys, found by binary search. With offsets every key maps to a list of rows
+    (rows[offsets[i]:offsets[i + 1]]), without them every key maps to the single row rows[i].
+    """
+    def __init__(self, keys, rows, offsets=None):
+        self._keys = keys
+        self._rows = rows
+        self._offsets = offsets
+
+    def _position(self, key):
+        if not isinstance(key, str):
+            return -1
+        encoded = key.encode()
+        position = bisect_left(self._keys, encoded)
+        if position < len(self._keys) and self._keys[position] == encoded:
+            return position
+        return -1
+
+    def _value(self, position):
+        if self._offsets is None:
+            return self._rows[position]
+        return self._rows[self._offsets[position]:self._offsets[position + 1]].tolist()
+
+    def get(self, key, default=None):
+        position = self._position(key)
+        return default if position < 0 else self._value(position)
+
+    def __getitem__(self, key):
+        position = self._position(key)
+        if position < 0:
+            raise KeyError(key)
+        return self._value(position)
+
+    def __contains__(self, key):
+        return self._position(key) >= 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        for position in range(len(self._keys)):
+            yield self._keys[position].decode()
+
+    def items(self):
+        for position in range(len(self._keys)):
+            yield self._keys[position].decode(), self._value(position)
+
+
+class OptionalRows:
+    """read only sequence of rows where -1 reads as None"""
+    def __init__(self, rows):
+        self._rows = rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, row):
+        value = self._rows[row]
+        return None if value < 0 else value
+
+
+class AncestorRows:
+    """row --> tuple of rows from the direct parent up to the root, walked from the parent rows on every read"""
+    def __init__(self, parent_rows):
+        self._parent_rows = parent_rows
+
+    def __len__(self):
+        return len(self._parent_rows)
+
+    def __getitem__(self, row):
+        chain = []
+        current = self._parent_rows[row]
+        while current >= 0 and current != row and current not in chain:
+            chain.append(current)
+            current = self._parent_rows[current]
+        return tuple(chain)
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _offsets(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _blob(values):
+    values = list(values)
+    return _offsets([len(value) for value in values]), np.frombuffer(b''.join(values), dtype=np.uint8)
@@ -0,0 +1,297 @@
+import hashlib
+import marshal
+import numpy as np
+from mapsindoors.geodata import *
+
+
+BASE_TYPES = ('venue', 'building', 'floor', 'room', 'area', 'poi')
+BASE_TYPE_CODES = {base_type: code for code, base_type in enumerate(BASE_TYPES)}
+
+
+def geometry_bbox(geometry):
+    """
+    [min_lon, min_lat, max_lon, max_lat] of a geojson geometry dict. uses the bbox the API sends when there is one,
+    otherwise it is computed from the coordinates. returns None for a geometry without coordinates.
+    """
+    if not geometry:
+        return None
+    bbox = geometry.get('bbox')
+    if bbox:
+        return bbox[:4]
+    min_lon = min_lat = float('inf')
+    max_lon = max_lat = float('-inf')
+    stack = [geometry.get('coordinates')]
+    while stack:
+        coordinates = stack.pop()
+        if not coordinates:
+            continue
+        if isinstance(coordinates[0], (int, float)):
+            lon, lat = coordinates[0], coordinates[1]
+            min_lon, max_lon = min(min_lon, lon), max(max_lon, lon)
+            min_lat, max_lat = min(min_lat, lat), max(max_lat, lat)
+        else:
+            stack.extend(coordinates)
+    if min_lon == float('inf'):
+        return None
+    return [min_lon, min_lat, max_lon, max_lat]
+
+
+def bbox_overlaps(boxes, bbox):
+    """
+    vectorized bbox overlap test. boxes is an (N, 4) array of [min_lon, min_lat, max_lon, max_lat], bbox one box.
+    returns a boolean array, rows with NaN boxes (no geometry) never overlap.
+    """
+    return (boxes[:, 0] <= bbox[2]) & (boxes[:, 2] >= bbox[0]) & (boxes[:, 1] <= bbox[3]) & (boxes[:, 3] >= bbox[1])
+
+
+def item_hash(item):
+    """
+    16 byte digest of a geodata dict's content. only meant to be compared within one process.
+    marshal is about 4x faster than json.dumps here. it keeps the key order, so the same content with its keys in another
+    order hashes differently. the API always sends them in the same order, and a false difference only means an unchanged
+    item is applied again. format 2 is used because later formats write back-references that depend on how objects are shared.
+    """
+    return hashlib.blake2b(marshal.dumps(item, 2), digest_size=16).digest()
+
+
+class StringTable:
+    """
+    Interned strings. Every distinct string gets a small int code, so a column can hold codes instead of strings.
+    """
+    def __init__(self, strings=()):
+        self.strings = []
+        self.codes = {}
+        for string in strings:
+            self.add(string)
+
+    def add(self, string):
+        """returns the code of string, adding it to the table when it's new"""
+        code = self.codes.get(string)
+        if code is None:
+            code = len(self.strings)
+            self.codes[string] = code
+            self.strings.append(string)
+        return code
+
+    def code(self, string):
+        """returns the code of string or -1 when it isn't in the table"""
+        return self.codes.get(string, -1)
+
+    def __getitem__(self, code):
+        return self.strings[code]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class GeodataStore:
+    #False when the rows can't be changed (see geodata_file.MappedGeodataStore)
+    read_only = False
+
+    def __init__(self, capacity:int=1024):
+        """
+        Columnar copy of the fields GeoFunctions filters on, one row per geodata item. The raw dicts are kept in items and
+        rows turn into Geodata objects only when they are read (store[row]), so no list of objects has to be held.
+
+        items: list of the raw geodata dicts
+        row_by_id: id --> row
+        base_type: int8 code from BASE_TYPES, -1 for unknown base types
+        status: int32 status bitfield
+        display_type: int32 code into display_type_ids, -1 when there is no displayTypeId
+        parent: int32 code into parent_ids, -1 when there is no parentId
+        anchors: float64 (rows, 2) array of [lon, lat], NaN without an anchor
+        bbox: float64 (rows, 4) array of [min_lon, min_lat, max_lon, max_lat], NaN without a geometry
+
+        columns are over-allocated so append() is cheap. the properties return views trimmed to the number of rows.
+
+        examples
+        -------
+
+        store = GeodataStore.from_items(geodata_response)
+        store.filter_rows(base_type=('room', 'area'), status=3)
+        store[0].properties.name.en
+        """
+        self.items = []
+        self.row_by_id = {}
+        self.display_type_ids = StringTable()
+        self.parent_ids = StringTable()
+        self._allocate(max(1, capacity))
+
+    @classmethod
+    def from_items(cls, items):
+        """
+        builds a store from geodata dicts. any iterable that isn't a list (e.g. iter_raw_geodata) is consumed one item at
+        a time, so every item goes straight into the store as it is parsed. a store is copied, see copy.
+        the store never holds on to the list or store it was given, so changing the store later (refresh, apply_geodata)
+        doesn't reorder the caller's list or another GeoFunctions' store. the dicts themselves are shared, not copied.
+        """
+        if isinstance(items, GeodataStore):
+            return items.copy()
+        store = cls(capacity=len(items)) if isinstance(items, list) else cls()
+        for item in items:
+            store.append(item)
+        return store
+
+    def copy(self):
+        """a store with its own items list, id index, string tables and columns, holding the same geodata dicts"""
+        store = GeodataStore.__new__(GeodataStore)
+        store.items = list(self.items)
+        store.row_by_id = dict(self.row_by_id)
+        store.display_type_ids = StringTable(self.display_type_ids.strings)
+        store.parent_ids = StringTable(self.parent_ids.strings)
+        for name in ('_base_type', '_status', '_display_type', '_parent', '_anchors', '_bbox'):
+            setattr(store, name, getattr(self, name).copy())
+        store._capacity = self._capacity
+        return store
+
+    def _allocate(self, capacity):
+        rows = len(self.items)
+        columns = {
+            '_base_type': np.full(capacity, -1, dtype=np.int8),
+            '_status': np.zeros(capacity, dtype=np.int32),
+            '_display_type': np.full(capacity, -1, dtype=np.int32),
+            '_parent': np.full(capacity, -1, dtype=np.int32),
+            '_anchors': np.full((capacity, 2), np.nan),
+            '_bbox': np.full((capacity, 4), np.nan),
+        }
+        for name, column in columns.items():
+            if rows:
+                column[:rows] = getattr(self, name)[:rows]
+            setattr(self, name, column)
+        self._capacity = capacity
+
+    def append(self, item):
+        """adds one geodata dict as a new row and returns the row"""
+        row = len(self.items)
+        if row == self._capacity:
+            self._allocate(self._capacity * 2)
+        self.items.append(item)
+        self.row_by_id[item['id']] = row
+        self._set_columns(row, item)
+        return row
+
+    def update(self, row, item):
+        """replaces the geodata dict of an existing row. the id may change"""
+        old_id = self.items[row]['id']
+        if self.row_by_id.get(old_id) == row:
+            del self.row_by_id[old_id]
+        self.items[row] = item
+        self.row_by_id[item['id']] = row
+        self._set_columns(row, item)
+
+    def delete(self, row):
+        """
+        removes a row by moving the last row into its place, so nothing else has to shift.
+        returns the old row number of the row that was moved (the last row), or None when row was the last row.
+        """
+        last = len(self.items) - 1
+        del self.row_by_id[self.items[row]['id']]
+        moved = None
+        if row != last:
+            moved_item = self.items[last]
+            self.items[row] = moved_item
+            self.row_by_id[moved_item['id']] = row
+            for name in ('_base_type', '_status', '_display_type', '_parent', '_anchors', '_bbox'):
+                column = getattr(self, name)
+                column[row] = column[last]
+            moved = last
+        self.items.pop()
+        self._base_type[last] = -1
+        self._status[last] = 0
+        self._display_type[last] = -1
+        self._parent[last] = -1
+        self._anchors[last] = np.nan
+        self._bbox[last] = np.nan
+        return moved
+
+    def _set_columns(self, row, item):
+        self._base_type[row] = BASE_TYPE_CODES.get(item['baseType'], -1)
+        self._status[row] = item.get('status', 0)
+        display_type_id = item.get('displayTypeId')
+        self._display_type[row] = -1 if display_type_id is None else self.display_type_ids.add(display_type_id)
+        parent_id = item.get('parentId')
+        self._parent[row] = -1 if parent_id is None else self.parent_ids.add(parent_id)
+        anchor = item.get('anchor')
+        self._anchors[row] = anchor['coordinates'][:2] if anchor else np.nan
+        bbox = geometry_bbox(item.get('geometry'))
+        self._bbox[row] = np.nan if bbox is None else bbox
+
+    def exterior_ring(self, row):
+        """[[lon, lat], ...] of the outer ring of a room or area polygon, first point repeated at the end"""
+        return self.items[row]['geometry']['coordinates'][0]
+
+    @property
+    def base_type(self):
+        return self._base_type[:len(self.items)]
+
+    @property
+    def status(self):
+        return self._status[:len(self.items)]
+
+    @property
+    def display_type(self):
+        return self._display_type[:len(self.items)]
+
+    @property
+    def parent(self):
+        return self._parent[:len(self.items)]
+
+    @property
+    def anchors(self):
+        return self._anchors[:len(self.items)]
+
+    @property
+    def bbox(self):
+        return self._bbox[:len(self.items)]
+
+    def filter_rows(self, base_type=None, status=None, display_type_id=None, parent_id=None, bbox=None):
+        """
+        Returns a numpy array of the rows matching every filter that is given.
+
+        Parameters
+        ----------
+        base_type --> a baseType or a list of baseTypes, e.g. 'room' or ('room', 'area')
+        status --> a status value or a list of values, e.g. 3 for active and searchable
+        display_type_id --> a displayTypeId or a list of them
+        parent_id --> a parentId or a list of them
+        bbox --> [min_lon, min_lat, max_lon, max_lat]. keeps rows whose bbox overlaps it
+
+        examples
+        -------
+
+        filter_rows(base_type='poi', status=3)
+        filter_rows(parent_id='77eac43db1094a40add4f0b6', bbox=[9.95, 57.05, 9.96, 57.06])
+        """
+        mask = np.ones(len(self.items), dtype=bool)
+        if base_type is not None:
+            mask &= np.isin(self.base_type, [BASE_TYPE_CODES.get(value, -2) for value in _as_list(base_type)])
+        if status is not None:
+            mask &= np.isin(self.status, _as_list(status))
+        # values that aren't in a string table can't match any row, -1 would match the rows without a value
+        if display_type_id is not None:
+            codes = [self.display_type_ids.code(value) for value in _as_list(display_type_id)]
+            mask &= np.isin(self.display_type, [code for code in codes if code >= 0])
+        if parent_id is not None:
+            codes = [self.parent_ids.code(value) for value in _as_list(parent_id)]
+            mask &= np.isin(self.parent, [code for code in codes if code >= 0])
+        if bbox is not None:
+            mask &= bbox_overlaps(self.bbox, bbox)
+        return np.flatnonzero(mask)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [Geodata(item) for item in self.items[row]]
+        return Geodata(self.items[row])
+
+    def __iter__(self):
+        for item in self.items:
+            yield Geodata(item)
+
+
+def _as_list(value):
+    if isinstance(value, (list, tuple, set, np.ndarray)):
+        return list(value)
+    return [value]
@@ -0,0 +1,135 @@
+import codecs
+import json
+
+
+_NUMBER_CHARACTERS = set('0123456789+-.eE')
+
+
+class JsonArrayParser:
+    """
+    Push parser for a JSON array. feed() it chunks as they arrive and it returns the elements that are complete so far.
+    Only the unparsed tail is kept between calls. Used by iter_json_array and by the async client, which gets its chunks
+    from an async stream.
+
+    examples
+    -------
+
+    parser = JsonArrayParser()
+    for chunk in chunks:
+        for item in parser.feed(chunk):
+            store.append(item)
+    parser.close()
+    """
+    def __init__(self):
+        # json.loads shares one string per distinct key across the whole document. parsing element by element loses that,
+        # so keys are shared through this table instead, otherwise every dict would hold its own copy of 'id', 'parentId', etc.
+        keys = {}
+        self._decoder = json.JSONDecoder(object_pairs_hook=lambda pairs: {keys.setdefault(key, key): value for key, value in pairs})
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._started = False
+        self.finished = False
+
+    def feed(self, chunk):
+        """takes bytes or str, chunk borders can fall anywhere. returns a list of the elements completed by this chunk"""
+        self._buffer += self._utf8.decode(chunk) if isinstance(chunk, bytes) else chunk
+        return self._parse(last_chunk=False)
+
+    def close(self):
+        """call after the last chunk. returns any remaining elements and raises ValueError when the array isn't complete"""
+        self._buffer += self._utf8.decode(b'', final=True)
+        elements = self._parse(last_chunk=True)
+        if not self.finished:
+            raise ValueError('JSON array is not terminated')
+        return elements
+
+    def _parse(self, last_chunk):
+        elements = []
+        buffer = self._buffer
+        position = 0
+        while not self.finished:
+            position = _skip_whitespace(buffer, position)
+            if position == len(buffer):
+                break
+            if not self._started:
+                if buffer[position] != '[':
+                    raise ValueError('expected a JSON array')
+                self._started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                self.finished = True
+                break
+            if buffer[position] == ',':
+                position += 1
+                continue
+            try:
+                element, end = self._decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if last_chunk:
+                    raise
+                break
+            # only accept the element once the next ',' or ']' has arrived. a number like 1.5 split as '1.' + '5' would
+            # otherwise decode early as 1
+            next_position = _skip_whitespace(buffer, end)
+            if next_position == len(buffer):
+                if last_chunk:
+                    raise ValueError('JSON array is not terminated')
+                break
+            if buffer[next_position] not in ',]':
+                if not last_chunk and next_position == end and all(character in _NUMBER_CHARACTERS for character in buffer[end:]):
+                    break
+                raise ValueError(f'unexpected {buffer[next_position]!r} after array element')
+            elements.append(element)
+            position = end
+        # drop what has been parsed so the buffer only holds the unparsed tail
+        self._buffer = buffer[position:]
+        return elements
+
+
+def iter_json_array(chunks):
+    """
+    Parses a JSON array one element at a time from an iterable of byte (or str) chunks, e.g. response.iter_content().
+    Only the elements of the current chunk and the unparsed tail are held in memory.
+
+    Parameters
+    ----------
+    chunks --> iterable of bytes or str. chunk borders can fall anywhere, also inside an element or a multi-byte character
+
+    Returns
+    -------
+
+    generator of the decoded array elements.
+
+    examples
+    -------
+
+    for item in iter_json_array(response.iter_content(chunk_size=65536)):
+        store.append(item)
+    """
+    parser = JsonArrayParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.finished:
+            return
+    yield from parser.close()
+
+
+def iter_json_array_file(path, chunk_size:int=65536):
+    """
+    Same as iter_json_array but reads from a file, e.g. a saved /geodata response.
+
+    examples
+    -------
+
+    GeoFunctions.from_data(api_key, iter_json_array_file('geodata.json'), location_types, categories, app_user_roles)
+    """
+    with open(path, 'rb') as file:
+        yield from iter_json_array(iter(lambda: file.read(chunk_size), b''))
+
+
+def _skip_whitespace(buffer, position):
+    length = len(buffer)
+    while position < length and buffer[position] in ' \t\n\r':
+        position += 1
+    return position
@@ -0,0 +1,51 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+
+#(connect, read) timeout in seconds used for every request unless ApiInstance/OAuthToken get their own.
+DEFAULT_TIMEOUT = (5, 120)
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def create_session(pool_connections:int=4, pool_maxsize:int=16, max_retries:int=0):
+    """
+    Creates a requests.Session that keeps connections open and asks for compressed responses.
+
+    Parameters
+    ----------
+    pool_connections --> number of hosts to keep a connection pool for (integration + auth is 2)
+    pool_maxsize --> max open connections per host. should be >= the number of threads sharing the session
+    max_retries --> retries on connection errors, passed to the HTTPAdapter
+
+    Returns
+    -------
+
+    a requests.Session that can be passed to ApiInstance, OAuthToken and GeoFunctions.
+
+    examples
+    -------
+
+    session = create_session(pool_maxsize=32)
+    GeoFunctions(api_key, session=session)
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=max_retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept': 'application/json', 'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+    return session
+
+
+def get_default_session():
+    """
+    The session shared by every ApiInstance and OAuthToken that isn't given its own. created on first use.
+    """
+    global _default_session
+    if _default_session is None:
+        with _default_session_lock:
+            if _default_session is None:
+                _default_session = create_session()
+    return _default_session
@@ -0,0 +1,264 @@
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from urllib.parse import urlsplit
+
+
+#upper bounds in seconds of the latency histograms.  GeoFunctions lookups take microseconds, a big /geodata download can take a minute.
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+#help text of the metrics the library records, used in the prometheus dump.
+DESCRIPTIONS = {
+    'mapsindoors_method_seconds': 'Duration of public GeoFunctions calls made from outside the class.',
+    'mapsindoors_method_errors_total': 'Public GeoFunctions calls that raised.',
+    'mapsindoors_load_seconds': 'Duration of the phases of building a GeoFunctions.',
+    'mapsindoors_http_request_seconds': 'Time from sending a request until the response arrived (the headers only for streamed and aiohttp responses).',
+    'mapsindoors_http_responses_total': 'HTTP responses by endpoint, method and status. status is error when no response arrived.',
+    'mapsindoors_http_wait_seconds': 'Time a request waited for the rate limiter before it was sent.',
+    'mapsindoors_http_response_bytes_total': 'Decompressed response body bytes read by ApiInstance and AsyncApiInstance.',
+    'mapsindoors_http_parse_seconds': 'Time spent parsing JSON response bodies.',
+    'mapsindoors_cache_lookups_total': 'SnapshotCache lookups by result: fresh, not_modified, unchanged, miss, or stale when revalidation failed and the snapshot on disk was used.',
+}
+
+#private GeoFunctions methods timed as load phases
+LOAD_PHASES = ('_load_geodata', '_build_indexes', '_build_hierarchy')
+
+_metrics = None
+_originals = {}
+_lock = threading.Lock()
+_depth = threading.local()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        # bucket i counts values <= buckets[i], the last one everything above
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """[[upper bound, number of values <= it], ...] ending with '+Inf', like prometheus buckets"""
+        total = 0
+        result = []
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            result.append([bound, total])
+        return result
+
+
+class Metrics:
+    def __init__(self, callback=None, buckets=DEFAULT_BUCKETS):
+        """
+        Counters and latency histograms, each identified by a name and labels. Thread safe.
+
+        Parameters
+        ----------
+        callback --> optional callback(name, labels, value) called after every observation and increment, e.g. to forward
+                     them to statsd. it runs on the thread that recorded the value, so it has to be quick
+        buckets --> upper bounds in seconds of every histogram
+        """
+        self.callback = callback
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+        if self.callback is not None:
+            self.callback(name, labels, value)
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+        if self.callback is not None:
+            self.callback(name, labels, amount)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        """
+        Returns
+        -------
+
+        json friendly copy of everything recorded:
+        {'counters': [{'name', 'labels', 'value'}], 'histograms': [{'name', 'labels', 'count', 'sum', 'buckets'}]}
+        where buckets is cumulative, see Histogram.cumulative
+        """
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{'name': name, 'labels': dict(labels), 'count': histogram.count, 'sum': histogram.sum,
+                           'buckets': histogram.cumulative()} for (name, labels), histogram in sorted(self._histograms.items())]
+        return {'counters': counters, 'histograms': histograms}
+
+    def prometheus_text(self):
+        """everything recorded in the prometheus text exposition format, e.g. to serve on a /metrics endpoint"""
+        snapshot = self.snapshot()
+        lines = []
+        written = set()
+        for kind, entries in (('counter', snapshot['counters']), ('histogram', snapshot['histograms'])):
+            for entry in entries:
+                name = entry['name']
+                if name not in written:
+                    written.add(name)
+                    if name in DESCRIPTIONS:
+                        lines.append(f'# HELP {name} {DESCRIPTIONS[name]}')
+                    lines.append(f'# TYPE {name} {kind}')
+                labels = entry['labels']
+                if kind == 'counter':
+                    lines.append(f"{name}{_labels(labels)} {_number(entry['value'])}")
+                    continue
+                for bound, count in entry['buckets']:
+                    lines.append(f"{name}_bucket{_labels({**labels, 'le': _number(bound)})} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(entry['sum'])}")
+                lines.append(f"{name}_count{_labels(labels)} {entry['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+def enable(callback=None, buckets=DEFAULT_BUCKETS):
+    """
+    Starts recording, returns the Metrics everything goes to. Off by default; while it's off the only cost is one
+    get_metrics() check per HTTP request, and GeoFunctions methods aren't wrapped at all.
+
+    What is recorded:
+    - every public GeoFunctions method: call count, errors and a latency histogram. only calls from outside the class are
+      counted, so get_distance doesn't also show up as two get_location calls. generator methods (iter_subtree) are
+      left alone since their time is spent in the caller's loop
+    - the GeoFunctions load phases in LOAD_PHASES: building the store, the indexes and the hierarchy
+    - every HTTP request through rate_limit.ApiScheduler (reads, bulk writes, async) and every token request: latency
+      per endpoint and method, responses per status, time spent waiting for the rate limiter
+    - ApiInstance and AsyncApiInstance: response bytes and JSON parse time per endpoint, and SnapshotCache results
+
+    Calling enable again replaces the Metrics.
+
+    Parameters
+    ----------
+    callback --> see Metrics
+    buckets --> see Metrics
+
+    examples
+    -------
+
+    metrics = instrumentation.enable()
+    geo_functions = GeoFunctions(api_key)
+    geo_functions.get_location('8d9b21b028df40e38f8c52d7')
+    print(metrics.prometheus_text())
+    instrumentation.disable()
+    """
+    global _metrics
+    with _lock:
+        _metrics = Metrics(callback, buckets)
+        _wrap_geo_functions()
+    return _metrics
+
+
+def disable():
+    """stops recording and puts the original GeoFunctions methods back"""
+    global _metrics
+    with _lock:
+        _metrics = None
+        from mapsindoors.geo_functions import GeoFunctions
+        for name, original in _originals.items():
+            setattr(GeoFunctions, name, original)
+        _originals.clear()
+
+
+def get_metrics():
+    """the Metrics being recorded to, or None when instrumentation is off"""
+    return _metrics
+
+
+def endpoint_name(url):
+    """last path segment of a url, e.g. 'geodata' for .../api/geodata"""
+    return urlsplit(url).path.rstrip('/').rsplit('/', 1)[-1]
+
+
+def observe_request(metrics, method, url, seconds, status):
+    endpoint = endpoint_name(url)
+    metrics.observe('mapsindoors_http_request_seconds', seconds, endpoint=endpoint, method=method)
+    metrics.increment('mapsindoors_http_responses_total', endpoint=endpoint, method=method, status='error' if status is None else str(status))
+
+
+def count_bytes(chunks, metrics, endpoint):
+    """passes chunks through and adds up their size, for streamed responses"""
+    total = 0
+    try:
+        for chunk in chunks:
+            total += len(chunk)
+            yield chunk
+    finally:
+        metrics.increment('mapsindoors_http_response_bytes_total', total, endpoint=endpoint)
+
+
+def _wrap_geo_functions():
+    from mapsindoors.geo_functions import GeoFunctions
+    if _originals:
+        return
+    for name, attribute in list(GeoFunctions.__dict__.items()):
+        if name in LOAD_PHASES:
+            wrapper = _timed(attribute, 'mapsindoors_load_seconds', {'phase': name.lstrip('_')}, outermost=False)
+        elif name.startswith('_') and name != '__init__':
+            continue
+        elif isinstance(attribute, classmethod):
+            wrapper = classmethod(_timed(attribute.__func__, 'mapsindoors_method_seconds', {'method': name}))
+        elif inspect.isfunction(attribute) and not inspect.isgeneratorfunction(attribute):
+            wrapper = _timed(attribute, 'mapsindoors_method_seconds', {'method': name})
+        else:
+            continue
+        _originals[name] = attribute
+        setattr(GeoFunctions, name, wrapper)
+
+
+def _timed(function, metric, labels, outermost=True):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        metrics = _metrics
+        depth = getattr(_depth, 'value', 0)
+        if metrics is None or (outermost and depth):
+            return function(*args, **kwargs)
+        _depth.value = depth + 1
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except Exception:
+            if outermost:
+                metrics.increment('mapsindoors_method_errors_total', **labels)
+            raise
+        finally:
+            _depth.value = depth
+            metrics.observe(metric, time.perf_counter() - start, **labels)
+    return wrapper
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -1,26 +1,108 @@
 import requests
 import json
+import time
 from mapsindoors.url_classes import *
 from mapsindoors.geodata import *
+from mapsindoors.geodata_stream import *
+from mapsindoors.http_session import *
+from mapsindoors.snapshot_cache import *
+from mapsindoors.rate_limit import *
+from mapsindoors.instrumentation import *
 
 class ApiInstance:
-    def __init__(self, api_key):
+    def __init__(self, api_key, session=None, timeout=DEFAULT_TIMEOUT, cache=None, scheduler=None, integration_url=None):
+        """
+        session: requests.Session used for every call. defaults to the shared pooled session from http_session.get_default_session.
+        timeout: (connect, read) timeout in seconds.
+        cache: optional SnapshotCache. responses are then kept on disk and revalidated instead of downloaded again.
+        scheduler: rate_limit.ApiScheduler every request goes through. defaults to the shared rate_limit.get_default_scheduler.
+        integration_url: root of the Integration API. defaults to url_classes.get_integration_url (MAPSINDOORS_INTEGRATION_URL or production).
+        """
         self.api_key = api_key
-        self.url = Urls(api_key, response_format="json")
+        self.url = Urls(api_key, response_format="json", integration_url=integration_url)
+        self.session = session if session is not None else get_default_session()
+        self.timeout = timeout
+        self.cache = cache
+        self.scheduler = scheduler if scheduler is not None else get_default_scheduler()
+
+    def _get(self, url, headers, **kwargs):
+        response = self.scheduler.request(self.session, 'GET', url, api_key=self.api_key, headers=headers, timeout=self.timeout, **kwargs)
+        metrics = get_metrics()
+        if metrics is not None and not kwargs.get('stream'):
+            metrics.increment('mapsindoors_http_response_bytes_total', len(response.content), endpoint=endpoint_name(url))
+        return response
+
+    def _parse(self, endpoint, response):
+        metrics = get_metrics()
+        if metrics is None:
+            return response.json()
+        start = time.perf_counter()
+        data = response.json()
+        metrics.observe('mapsindoors_http_parse_seconds', time.perf_counter() - start, endpoint=endpoint)
+        return data
+
+    def _count_cache(self, endpoint, result):
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.increment('mapsindoors_cache_lookups_total', endpoint=endpoint, result=result)
+
+    def _get_json(self, endpoint, url):
+        if self.cache is None:
+            response = self._get(url, {'Accept': 'application/json'})
+            return self._parse(endpoint, response)
+        data, meta = self.cache.load(self.api_key, endpoint)
+        if data is not None and self.cache.is_fresh(meta):
+            self._count_cache(endpoint, 'fresh')
+            return data
+        headers = {'Accept': 'application/json'}
+        if data is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        response = self._get(url, headers)
+        if data is not None and response.status_code == 304:
+            self._count_cache(endpoint, 'not_modified')
+            self.cache.touch(self.api_key, endpoint, meta)
+            return data
+        if not response.ok:
+            # an error page is never parsed or cached. with a snapshot on disk the stale data beats no data
+            if data is not None:
+                self._count_cache(endpoint, 'stale')
+                return data
+            return self._parse(endpoint, response)
+        response_hash = content_hash(response.content)
+        # servers that send no validators still return the same bytes when nothing changed, that skips parsing and rewriting the snapshot
+        if data is not None and meta.get('content_hash') == response_hash:
+            self._count_cache(endpoint, 'unchanged')
+            self.cache.touch(self.api_key, endpoint, meta)
+            return data
+        self._count_cache(endpoint, 'miss')
+        data = self._parse(endpoint, response)
+        meta = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified'),
+                'content_hash': response_hash, 'fetched_at': time.time()}
+        self.cache.save(self.api_key, endpoint, data, meta)
+        return data
 
     def get_app_user_roles(self):
-    	response = requests.request("GET", url=self.url.app_user_roles_url(), headers={'Accept': 'application/json'})
-    	return response.json()
+    	return self._get_json(self.url.app_user_roles, self.url.app_user_roles_url())
 
     #returns the full datasest for all geodata objects in a solution
     def get_raw_geodata(self):
-    	response = requests.request("GET", url=self.url.geodata_url(), headers={'Accept': 'application/json'})
-    	return response.json()
+    	return self._get_json(self.url.geodata, self.url.geodata_url())
+
+    #same data as get_raw_geodata, but parsed one item at a time while it downloads so the full response is never held in memory.
+    def iter_raw_geodata(self, chunk_size=65536):
+        with self._get(self.url.geodata_url(), {'Accept': 'application/json'}, stream=True) as response:
+            response.raise_for_status()
+            chunks = response.iter_content(chunk_size=chunk_size)
+            metrics = get_metrics()
+            if metrics is not None:
+                chunks = count_bytes(chunks, metrics, self.url.geodata)
+            yield from iter_json_array(chunks)
 
     def get_location_types(self):
-        response = requests.request("GET", url=self.url.display_types_url(), headers={'Accept': 'application/json'})
-        return response.json()
+        return self._get_json(self.url.display_types, self.url.display_types_url())
 
     def get_categories(self):
-        response = requests.request("GET", url=self.url.categories_url(), headers={'Accept': 'application/json'})
-        return response.json()
+        return self._get_json(self.url.categories, self.url.categories_url())
@@ -0,0 +1,253 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from mapsindoors.instrumentation import *
+
+
+#statuses the Integration API answers with when it is throttling.  the request wasn't processed, so any method can be sent again.
+THROTTLE_STATUSES = (429, 503)
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+class TokenBucket:
+    def __init__(self, rate:float, burst:float):
+        """
+        rate requests per second on average, with bursts of up to burst requests.
+        reserve() takes a token straight away and returns how long the caller has to wait before using it, so the same
+        bucket works for threads (time.sleep) and coroutines (asyncio.sleep).
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial:float=8, minimum:float=1, maximum:float=64, increase:float=1, decrease:float=0.5):
+        """
+        AIMD concurrency limit. Every request that isn't throttled raises the limit by increase/limit, so about +increase
+        per round of requests. A throttled request multiplies it by decrease. Throttles from requests that were sent
+        before the last decrease are ignored, because they describe the load from before it.
+        """
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self._decreased_at = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """blocks until a request may be sent. returns the start time to pass to release"""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def try_acquire(self):
+        """like acquire but returns None instead of waiting"""
+        with self._condition:
+            if self.in_flight >= int(self.limit):
+                return None
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started_at, throttled=None):
+        """throttled: True lowers the limit, False raises it, None (e.g. a connection error) leaves it alone"""
+        with self._condition:
+            self.in_flight -= 1
+            if throttled is True:
+                if started_at >= self._decreased_at:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._decreased_at = time.monotonic()
+            elif throttled is False:
+                self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+            self._condition.notify_all()
+
+
+class _KeyState:
+    def __init__(self, scheduler):
+        self.bucket = TokenBucket(scheduler.rate, scheduler.burst)
+        self.limiter = AdaptiveLimiter(scheduler.initial_concurrency, scheduler.min_concurrency, scheduler.max_concurrency)
+        self.paused_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+
+class ApiScheduler:
+    def __init__(self, rate:float=20, burst:float=40, initial_concurrency:float=8, min_concurrency:float=1,
+                 max_concurrency:float=64, max_retries:int=5, backoff:float=0.5, max_backoff:float=60):
+        """
+        Paces Integration API requests per api key so a burst of parallel calls doesn't get throttled, and backs off when
+        it is. Every api key gets:
+        - a TokenBucket of rate requests per second with bursts of burst
+        - an AdaptiveLimiter that finds how many requests can be in flight at once
+        - a pause: a Retry-After from the server holds back every request for the key until then
+
+        A 429/503 response is sent again up to max_retries times, after Retry-After when the server sends one, otherwise
+        after a jittered exponential backoff. Other errors are returned to the caller as they are.
+
+        ApiInstance, AsyncApiInstance and BulkWriter use the shared get_default_scheduler() unless they're given one.
+
+        examples
+        -------
+
+        scheduler = ApiScheduler(rate=50, max_concurrency=16)
+        ApiInstance(api_key, scheduler=scheduler)
+        scheduler.stats(api_key) --> {'concurrency_limit': 12.4, 'in_flight': 0, 'requests': 130, 'throttled': 2}
+        """
+        self.rate = rate
+        self.burst = burst
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def _state(self, api_key):
+        state = self._keys.get(api_key)
+        if state is None:
+            with self._lock:
+                state = self._keys.get(api_key)
+                if state is None:
+                    state = self._keys[api_key] = _KeyState(self)
+        return state
+
+    def request(self, session, method, url, api_key=None, **kwargs):
+        """
+        session.request(method, url, **kwargs) for a requests.Session, paced for api_key. returns the response.
+        with stream=True the concurrency slot is given back once the headers have arrived, not when the body is read.
+        """
+        state = self._state(api_key)
+        attempt = 0
+        while True:
+            metrics = get_metrics()
+            waited_from = time.perf_counter()
+            time.sleep(self._turn_delay(state))
+            started_at = state.limiter.acquire()
+            sent_at = time.perf_counter()
+            throttled = None
+            status = None
+            try:
+                response = session.request(method, url, **kwargs)
+                status = response.status_code
+                throttled = status in THROTTLE_STATUSES
+            finally:
+                state.limiter.release(started_at, throttled)
+                if metrics is not None:
+                    self._observe(metrics, method, url, waited_from, sent_at, status)
+            delay = self._retry_delay(state, response.status_code, response.headers, attempt)
+            if delay is None:
+                return response
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    async def request_async(self, session, method, url, api_key=None, **kwargs):
+        """
+        request for an aiohttp.ClientSession. returns the ClientResponse, the caller reads it and calls release()
+        """
+        state = self._state(api_key)
+        attempt = 0
+        while True:
+            metrics = get_metrics()
+            waited_from = time.perf_counter()
+            await asyncio.sleep(self._turn_delay(state))
+            started_at = state.limiter.try_acquire()
+            # the limiter blocks threads, so coroutines poll it instead of holding up the event loop
+            while started_at is None:
+                await asyncio.sleep(0.005)
+                started_at = state.limiter.try_acquire()
+            sent_at = time.perf_counter()
+            throttled = None
+            status = None
+            try:
+                response = await session.request(method, url, **kwargs)
+                status = response.status
+                throttled = status in THROTTLE_STATUSES
+            finally:
+                state.limiter.release(started_at, throttled)
+                if metrics is not None:
+                    self._observe(metrics, method, url, waited_from, sent_at, status)
+            delay = self._retry_delay(state, response.status, response.headers, attempt)
+            if delay is None:
+                return response
+            response.release()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _observe(self, metrics, method, url, waited_from, sent_at, status):
+        now = time.perf_counter()
+        metrics.observe('mapsindoors_http_wait_seconds', sent_at - waited_from, endpoint=endpoint_name(url))
+        observe_request(metrics, method, url, now - sent_at, status)
+
+    def _turn_delay(self, state):
+        # seconds until this request may go: the key's pause, then a token from the bucket
+        pause = max(0.0, state.paused_until - time.monotonic())
+        return pause + state.bucket.reserve()
+
+    def _retry_delay(self, state, status, headers, attempt):
+        """counts the response. returns how long to wait before sending it again, or None when it shouldn't be retried"""
+        with state.lock:
+            state.requests += 1
+            if status in THROTTLE_STATUSES:
+                state.throttled += 1
+        if status not in THROTTLE_STATUSES or attempt >= self.max_retries:
+            return None
+        retry_after = parse_retry_after(headers.get('Retry-After'))
+        if retry_after is not None:
+            # the server said when it's ready again. that holds for every request of the key, not only this one
+            state.paused_until = max(state.paused_until, time.monotonic() + min(retry_after, self.max_backoff))
+            return 0.0
+        # full jitter, so requests that were throttled together don't all come back at the same moment
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def stats(self, api_key=None):
+        state = self._state(api_key)
+        return {'concurrency_limit': round(state.limiter.limit, 2), 'in_flight': state.limiter.in_flight,
+                'requests': state.requests, 'throttled': state.throttled}
+
+
+def parse_retry_after(value):
+    """seconds from a Retry-After header, which is either a number of seconds or an http date. None when missing or invalid"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def get_default_scheduler():
+    """
+    The scheduler shared by every ApiInstance, AsyncApiInstance and BulkWriter that isn't given its own. created on first use.
+    """
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_scheduler_lock:
+            if _default_scheduler is None:
+                _default_scheduler = ApiScheduler()
+    return _default_scheduler
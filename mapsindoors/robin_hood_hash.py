@@ -3,23 +3,54 @@
 # Applicant: Hunter Lee                                           #
 # Email: hl130@duke.edu                                           #
 ###################################################################
-import sys
+from array import array
+
+# probe length stored in an empty slot
+EMPTY = -1
 
 
 class HashMap(object):
 
-    def __init__(self, size: int):
+    def __init__(self, size: int = 8, max_load: float = 0.85):
         """Default constructor
-        Instantiates an instance of HashMap for the given number of objects.
-        Implements Robin Hood hashing.
+        Instantiates an empty HashMap with room for at least size slots. Implements Robin Hood hashing with linear
+        probing: an element that is further from its home slot than the one occupying a slot takes that slot, so probe
+        lengths stay short and even, lookups can stop early and deletes shift the following elements back instead of
+        leaving holes. The table doubles when an insert would push the load factor above max_load.
+
+        Slots are kept in parallel arrays: hash_list (the stored hash of every key, int64), probe_list (the distance from
+        the home slot, int32, EMPTY for a free slot), key_list and value_list. Comparing the stored hash first means keys
+        are only compared when they are very likely equal, and resizing never calls hash() again.
+        The number of slots is a power of two, so the home slot is hash & mask.
         Args:
-            size: size of the fixed-size hash map data structure
+            size: initial number of slots, rounded up to a power of two
+            max_load: load factor that triggers a resize, between 0 and 1
         """
-        self.size = size
-        # key_list is a list of (key, probe_length) tuples
-        self.key_list = [None] * self.size
-        self.value_list = [None] * self.size
+        if not 0 < max_load < 1:
+            raise ValueError('max_load has to be between 0 and 1')
+        self.max_load = max_load
         self.num_items = 0
+        self._allocate(_power_of_two(size))
+
+    @classmethod
+    def from_items(cls, items, max_load: float = 0.85):
+        """Bulk constructor
+        Builds a HashMap from (key, value) pairs or a dict. The table is sized once for all of them, so it never resizes
+        while loading. A key that appears more than once keeps its last value, like dict.
+        Args:
+            items: iterable of (key, value) pairs, or a mapping
+            max_load: see __init__
+        Returns:
+            HashMap
+        """
+        if hasattr(items, 'items'):
+            items = items.items()
+        items = list(items)
+        hash_map = cls(int(len(items) / max_load) + 1, max_load)
+        insert = hash_map._insert
+        for key, value in items:
+            insert(key, value, hash(key))
+        return hash_map
 
     def set(self, key: str, value):
         """Stores the given key/value pair in the hash map.
@@ -27,53 +58,23 @@ class HashMap(object):
             key: key string
             value: data object
         Returns:
-            Boolean indicating success/failure of the operation
+            True. The table grows instead of running full
         """
-        key, hash_index = self._process_key(key)
-        probe_length = 0
-        elem_to_swap, elem_to_swap_found, new_probe_length = None, False, 0
-        while probe_length < self.size:
-            # Key does not exist
-            if self.key_list[hash_index] is None:
-                # Store probe length with the key
-                self.key_list[hash_index] = key, probe_length
-                self.value_list[hash_index] = value
-                self.num_items += 1
-                # Swap if elem_to_swap has been found
-                if elem_to_swap_found:
-                    self._swap_elements(elem_to_swap, hash_index, new_probe_length)
-                return True
-            # Key already exists - update
-            elif self.key_list[hash_index][0] == key:
-                self.value_list[hash_index] = value
-                return True
-            # Hash index is occupied - linear probing
-            else:
-                # If existing element's probe length is lower, remember for swapping
-                if elem_to_swap_found is False and self.key_list[hash_index][1] < probe_length:
-                    elem_to_swap, elem_to_swap_found, new_probe_length = hash_index, True, probe_length
-                # Increment the index and try again
-                hash_index = self._increment_hash(hash_index)
-            probe_length += 1
-        return False
+        if self.num_items + 1 > self.size * self.max_load:
+            self._resize(self.size * 2)
+        self._insert(key, value, hash(key))
+        return True
 
-    def get(self, key: str):
+    def get(self, key: str, default=None):
         """Return the value associated with the given key.
         Args:
             key: key string
+            default: returned when the key isn't in the map
         Returns:
-            the value associated with the key or None if the key has no value
+            the value associated with the key or default if the key has no value
         """
-        key, hash_index = self._process_key(key)
-        for probe_length in range(self.size):
-            # Key matches, return value
-            if self.key_list[hash_index] is not None and self.key_list[hash_index][0] == key:
-                return self.value_list[hash_index]
-            # That index is null or keys don't match - linear probing
-            # Can't terminate when it's null - items might have been deleted
-            else:
-                hash_index = self._increment_hash(hash_index)
-        return None
+        index = self._find(key, hash(key))
+        return default if index is None else self.value_list[index]
 
     def delete(self, key: str):
         """Delete the key/value pair.
@@ -82,21 +83,14 @@ class HashMap(object):
         Returns:
             the value on success or None if the key has no value
         """
-        # Check if HashMap is empty
-        if self.load() == 0:
+        if self.num_items == 0:
+            return None
+        index = self._find(key, hash(key))
+        if index is None:
             return None
-        key, hash_index = self._process_key(key)
-        for probe_length in range(self.size):
-            # Key matches, set it to None and return value
-            if self.key_list[hash_index] is not None and self.key_list[hash_index][0] == key:
-                value = self.value_list[hash_index]
-                self.key_list[hash_index], self.value_list[hash_index] = None, None
-                self.num_items -= 1
-                return value
-            # That index is null or keys don't match - linear probing
-            else:
-                hash_index = self._increment_hash(hash_index)
-        return None
+        value = self.value_list[index]
+        self._remove(index)
+        return value
 
     def load(self):
         """Load
@@ -107,51 +101,142 @@ class HashMap(object):
         return self.num_items / self.size
 
     def clear(self):
-        """Clears the content for testing purposes"""
-        self.key_list.clear()
-        self.value_list.clear()
+        """Removes every element, keeping the current size"""
+        self._allocate(self.size)
         self.num_items = 0
 
-    def _process_key(self, key: str):
-        """Pre-processing step for key
-        Use string interning to make lookup more efficient (done in Python's dict) and compute hash-based index.
+    def items(self):
+        """Iterates over (key, value) pairs in slot order"""
+        for probe_length, key, value in zip(self.probe_list, self.key_list, self.value_list):
+            if probe_length != EMPTY:
+                yield key, value
+
+    def __getitem__(self, key):
+        index = self._find(key, hash(key))
+        if index is None:
+            raise KeyError(key)
+        return self.value_list[index]
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        index = self._find(key, hash(key))
+        if index is None:
+            raise KeyError(key)
+        self._remove(index)
+
+    def __contains__(self, key):
+        return self._find(key, hash(key)) is not None
+
+    def __iter__(self):
+        for probe_length, key in zip(self.probe_list, self.key_list):
+            if probe_length != EMPTY:
+                yield key
+
+    def __len__(self):
+        return self.num_items
+
+    def _allocate(self, size: int):
+        """Internal allocation of size empty slots"""
+        self.size = size
+        self.mask = size - 1
+        self.hash_list = array('q', bytes(8 * size))
+        self.probe_list = array('i', [EMPTY]) * size
+        self.key_list = [None] * size
+        self.value_list = [None] * size
+
+    def _find(self, key, key_hash: int):
+        """Internal lookup
+        Probes from the home slot and stops at an empty slot or at an element that is closer to its home slot than the
+        key would be, because Robin Hood insertion would have placed the key before it.
         Args:
-            key: str
+            key: key
+            key_hash: hash(key)
         Returns:
-            (key: str, hash_index: int) tuple
+            index of the key's slot or None
         """
-        key = sys.intern(key)
-        return key, hash(key) % self.size
+        hash_list, probe_list, key_list, mask = self.hash_list, self.probe_list, self.key_list, self.mask
+        index = key_hash & mask
+        probe_length = 0
+        while True:
+            slot_probe_length = probe_list[index]
+            # Empty slots hold EMPTY, which is always smaller
+            if slot_probe_length < probe_length:
+                return None
+            if hash_list[index] == key_hash and key_list[index] == key:
+                return index
+            index = (index + 1) & mask
+            probe_length += 1
 
-    def _increment_hash(self, index: int):
-        """Internal hash incrementer
+    def _insert(self, key, value, key_hash: int):
+        """Internal insert or update. There has to be at least one empty slot.
+        An existing key is always found before the first slot where the key would displace another element, so one pass
+        both looks for the key and finds where to put it.
         Args:
-            index: current hash index
-        Return:
-            incremented hash index
+            key: key
+            value: data object
+            key_hash: hash(key)
         """
-        return (index + 1) % self.size
+        hash_list, probe_list, key_list, value_list, mask = self.hash_list, self.probe_list, self.key_list, self.value_list, self.mask
+        index = key_hash & mask
+        probe_length = 0
+        while True:
+            # an empty slot or the first element closer to its home slot: the key isn't in the map
+            if probe_list[index] < probe_length:
+                break
+            if hash_list[index] == key_hash and key_list[index] == key:
+                value_list[index] = value
+                return
+            index = (index + 1) & mask
+            probe_length += 1
+        self.num_items += 1
+        while True:
+            slot_probe_length = probe_list[index]
+            if slot_probe_length == EMPTY:
+                hash_list[index] = key_hash
+                probe_list[index] = probe_length
+                key_list[index] = key
+                value_list[index] = value
+                return
+            # The element here is closer to its home slot: take its place and carry it on down the chain
+            if slot_probe_length < probe_length:
+                hash_list[index], key_hash = key_hash, hash_list[index]
+                probe_list[index], probe_length = probe_length, slot_probe_length
+                key_list[index], key = key, key_list[index]
+                value_list[index], value = value, value_list[index]
+            index = (index + 1) & mask
+            probe_length += 1
+
+    def _remove(self, index: int):
+        """Internal delete of the element at index
+        Backward shift: every following element that isn't in its home slot moves one step back.
+        """
+        hash_list, probe_list, key_list, value_list, mask = self.hash_list, self.probe_list, self.key_list, self.value_list, self.mask
+        next_index = (index + 1) & mask
+        while probe_list[next_index] > 0:
+            hash_list[index] = hash_list[next_index]
+            probe_list[index] = probe_list[next_index] - 1
+            key_list[index] = key_list[next_index]
+            value_list[index] = value_list[next_index]
+            index = next_index
+            next_index = (index + 1) & mask
+        probe_list[index] = EMPTY
+        key_list[index] = value_list[index] = None
+        self.num_items -= 1
 
-    def _swap_elements(self, existing_index: int, new_index: int, new_probe_length: int):
-        """Internal swap function
-        Swap elements in the HashMap for lower variance in probe lengths. Implement Robin Hood hashing.
+    def _resize(self, size: int):
+        """Internal resize
+        Allocates size slots and inserts every element again, using the stored hashes.
         Args:
-            existing_index: index: int of an existing element with lower probe length
-            new_index: index of the new element that has been inserted
-            new_probe_length: new value for probe length for newly inserted element
+            size: new number of slots, a power of two
         """
-        # Calculate the new probe length for existing element
-        delta = new_index - existing_index
-        if delta < 0:
-            delta = self.size - existing_index + new_index
-        # Update probe lengths
-        self.key_list[existing_index] = self.key_list[existing_index][0], self.key_list[existing_index][1] + delta
-        self.key_list[new_index] = self.key_list[new_index][0], new_probe_length
-        # Swap
-        self.key_list[existing_index], self.key_list[new_index] = \
-            self.key_list[new_index], self.key_list[existing_index]
-        self.value_list[existing_index], self.value_list[new_index] = \
-            self.value_list[new_index], self.value_list[existing_index]
+        old_slots = [(key_hash, key, value) for key_hash, probe_length, key, value
+                     in zip(self.hash_list, self.probe_list, self.key_list, self.value_list) if probe_length != EMPTY]
+        self._allocate(size)
+        self.num_items = 0
+        for key_hash, key, value in old_slots:
+            self._insert(key, value, key_hash)
 
     @property
     def probe_lengths(self):
@@ -159,4 +244,11 @@ class HashMap(object):
         Returns:
             list of probe lengths for elements present
         """
-        return [probe_length[1] for probe_length in self.key_list if probe_length is not None]
\ No newline at end of file
+        return [probe_length for probe_length in self.probe_list if probe_length != EMPTY]
+
+
+def _power_of_two(size: int):
+    power = 1
+    while power < size:
+        power *= 2
+    return power
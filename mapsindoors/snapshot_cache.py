@@ -0,0 +1,147 @@
+import gc
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'mapsindoors')
+
+
+class SnapshotCache:
+    def __init__(self, directory:str=DEFAULT_CACHE_DIRECTORY, max_age:float=300, max_bytes:int=2 * 1024**3):
+        """
+        On-disk cache of parsed Integration API responses, one snapshot per api key and endpoint.
+
+        Each snapshot is a pickle of the parsed response plus a small json file with the ETag, Last-Modified, a sha256 of
+        the response body and the time it was fetched. ApiInstance uses them like this:
+        - younger than max_age: returned straight from disk, no request is made
+        - older: the request is sent with If-None-Match/If-Modified-Since. a 304, or a body with the same hash when the
+          server sends neither header, keeps the snapshot and only resets its age
+        - an error status returns the snapshot as it is. it isn't touched, so the next call asks the server again
+        - any other successful response replaces the snapshot
+
+        Parameters
+        ----------
+        directory --> where the snapshots are written. shared by every solution using it
+        max_age --> seconds a snapshot is used without asking the server. 0 always revalidates
+        max_bytes --> once the snapshots in directory take more than this, the least recently used ones are deleted
+
+        the files are pickles, so only point directory at a folder that nobody else can write to.
+
+        examples
+        -------
+
+        cache = SnapshotCache(max_age=600)
+        GeoFunctions(api_key, cache=cache)
+        """
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, api_key, endpoint):
+        # the api key is hashed so it doesn't end up in file names
+        key = hashlib.sha256(f'{api_key}/{endpoint}'.encode()).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + '.pickle', base + '.json'
+
+    def load(self, api_key, endpoint):
+        """returns (data, meta) of a snapshot, or (None, None) when there is none"""
+        data_path, meta_path = self._paths(api_key, endpoint)
+        try:
+            with open(meta_path) as file:
+                meta = json.load(file)
+            with open(data_path, 'rb') as file:
+                data = _load_pickle(file)
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+            return None, None
+        # mtime doubles as the "last used" time for eviction. another process may have evicted the file since it was
+        # read, the data is still good
+        try:
+            os.utime(data_path)
+        except OSError:
+            pass
+        return data, meta
+
+    def is_fresh(self, meta):
+        return meta is not None and time.time() - meta.get('fetched_at', 0) < self.max_age
+
+    def save(self, api_key, endpoint, data, meta):
+        """writes a snapshot (data is pickled, meta is written as json) and evicts old snapshots when over max_bytes"""
+        data_path, meta_path = self._paths(api_key, endpoint)
+        if data is not None:
+            self._write_atomic(data_path, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        self._write_atomic(meta_path, json.dumps(meta).encode())
+        if data is not None:
+            self.evict()
+
+    def touch(self, api_key, endpoint, meta):
+        """marks a snapshot as just revalidated"""
+        meta['fetched_at'] = time.time()
+        self.save(api_key, endpoint, None, meta)
+
+    def _write_atomic(self, path, content):
+        # write to a temp file and rename it, so a reader never sees half a snapshot
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def evict(self):
+        """deletes the least recently used snapshots until the directory is under max_bytes"""
+        with self._lock:
+            snapshots = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.pickle'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    snapshots.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in snapshots)
+            for _, size, path in sorted(snapshots):
+                if total <= self.max_bytes:
+                    break
+                for remove_path in (path, path[:-len('.pickle')] + '.json'):
+                    try:
+                        os.remove(remove_path)
+                    except OSError:
+                        pass
+                total -= size
+
+    def clear(self):
+        """deletes every snapshot in directory"""
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(('.pickle', '.json')):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+def _load_pickle(file):
+    # unpickling allocates hundreds of thousands of dicts and lists. the cyclic gc would run over and over while that
+    # happens (about 4x slower for a 50k location solution), and none of it can be garbage yet
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.load(file)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def content_hash(content:bytes):
+    return hashlib.sha256(content).hexdigest()
@@ -0,0 +1,129 @@
+import heapq
+import numpy as np
+
+
+#points per leaf of a PointIndex.  leaves are searched with one numpy pass, so they can be fairly big.
+LEAF_SIZE = 64
+
+
+def unit_vectors(lon, lat):
+    """(3, N) points on the unit sphere for lon/lat in radians, one row per axis"""
+    cos_lat = np.cos(lat)
+    return np.vstack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+class PointIndex:
+    """
+    KD-tree over lon/lat points, for k nearest neighbour queries on the sphere.
+
+    The points are stored as 3D unit vectors. The squared straight line distance between two of them is
+    4 * sin(angle / 2)**2, the haversine term, so it ranks them exactly like great circle distance and has no
+    trouble with the antimeridian or the poles.
+
+    The tree is built once with numpy: every node covers a contiguous range of the reordered points and keeps its
+    bounding box, leaves hold up to LEAF_SIZE points. A query visits nodes closest box first and stops as soon as the
+    next box is further away than the k-th point found, so it only looks at a few leaves around the query point.
+    """
+
+    def __init__(self, lon, lat, leaf_size:int=LEAF_SIZE):
+        """
+        Parameters
+        ----------
+        lon, lat --> numpy arrays in radians. query results are positions in these arrays
+        leaf_size --> max number of points per leaf
+        """
+        points = unit_vectors(np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64))
+        # points and order are reordered together, so every node's points stay contiguous
+        order = np.arange(points.shape[1])
+        # node --> start, end (into order), children (-1 for leaves), box
+        starts, ends, lefts, rights, mins, maxs = [], [], [], [], [], []
+        stack = [(0, points.shape[1], -1, False)]
+        while stack:
+            start, end, parent, is_right = stack.pop()
+            node = len(starts)
+            if parent >= 0:
+                (rights if is_right else lefts)[parent] = node
+            node_points = points[:, start:end]
+            low, high = (node_points.min(axis=1), node_points.max(axis=1)) if end > start else (np.zeros(3), np.zeros(3))
+            starts.append(start)
+            ends.append(end)
+            lefts.append(-1)
+            rights.append(-1)
+            mins.append(low)
+            maxs.append(high)
+            if end - start > leaf_size:
+                # split the widest dimension at the median
+                dimension = int(np.argmax(high - low))
+                middle = (end - start) // 2
+                split = np.argpartition(node_points[dimension], middle)
+                order[start:end] = order[start:end][split]
+                points[:, start:end] = node_points[:, split]
+                stack.append((start + middle, end, node, True))
+                stack.append((start, start + middle, node, False))
+        self.order = order
+        self.points = points
+        self.starts = starts
+        self.ends = ends
+        self.lefts = lefts
+        self.rights = rights
+        # boxes as python floats: the query computes box distances one node at a time, where numpy's call overhead dominates
+        self.boxes = [tuple(low.tolist()) + tuple(high.tolist()) for low, high in zip(mins, maxs)]
+
+    def __len__(self):
+        return len(self.order)
+
+    def query(self, lon:float, lat:float, k:int, max_angle:float=None, exclude:int=None):
+        """
+        Parameters
+        ----------
+        lon, lat --> query point in radians
+        k --> number of points to return
+        max_angle --> optional. only points at most this central angle (radians, distance / earth radius) away
+        exclude --> optional position in lon/lat that is never returned, e.g. the query point itself
+
+        Returns
+        -------
+
+        (positions, haversine terms sin(angle / 2)**2) of up to k points, closest first. ties are ordered by position.
+        """
+        if k < 1 or len(self.order) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        query = unit_vectors(np.array([lon]), np.array([lat]))
+        x, y, z = query[:, 0].tolist()
+        limit = np.inf if max_angle is None else 4 * np.sin(min(max_angle, np.pi) / 2)**2
+        best_positions = np.empty(0, dtype=np.int64)
+        best_distances = np.empty(0)
+        kth = limit
+        heap = [(0.0, 0)]
+        while heap:
+            box_distance, node = heapq.heappop(heap)
+            if box_distance > kth:
+                break
+            left = self.lefts[node]
+            if left < 0:
+                start, end = self.starts[node], self.ends[node]
+                distances = ((self.points[:, start:end] - query)**2).sum(axis=0)
+                positions = self.order[start:end]
+                keep = distances <= kth
+                if exclude is not None:
+                    keep &= positions != exclude
+                best_positions = np.concatenate((best_positions, positions[keep]))
+                best_distances = np.concatenate((best_distances, distances[keep]))
+                if len(best_distances) > k:
+                    # a full sort of the few candidates, so ties at the k-th distance keep the lowest positions
+                    closest = np.lexsort((best_positions, best_distances))[:k]
+                    best_positions, best_distances = best_positions[closest], best_distances[closest]
+                if len(best_distances) == k:
+                    kth = min(kth, best_distances.max())
+                continue
+            for child in (left, self.rights[node]):
+                # squared distance from the query to the child's box
+                min_x, min_y, min_z, max_x, max_y, max_z = self.boxes[child]
+                gap_x = min_x - x if x < min_x else (x - max_x if x > max_x else 0.0)
+                gap_y = min_y - y if y < min_y else (y - max_y if y > max_y else 0.0)
+                gap_z = min_z - z if z < min_z else (z - max_z if z > max_z else 0.0)
+                child_distance = gap_x * gap_x + gap_y * gap_y + gap_z * gap_z
+                if child_distance <= kth:
+                    heapq.heappush(heap, (child_distance, child))
+        order = np.lexsort((best_positions, best_distances))
+        return best_positions[order], best_distances[order] / 4
@@ -0,0 +1,135 @@
+import math
+import random
+
+
+#names used for the generated display types.  the first few mirror common MapsIndoors location types.
+DISPLAY_TYPE_NAMES = ['meeting room', 'office', 'toilet', 'kitchen', 'elevator', 'stairs', 'parking', 'reception',
+                      'desk', 'printer', 'storage', 'lounge', 'auditorium', 'entrance', 'info', 'shop']
+CATEGORY_NAMES = ['IoT devices', 'Bookable', 'Accessible', 'Food', 'Facilities', 'Emergency', 'Services', 'Events']
+LANGUAGES = ('en', 'da', 'de')
+
+
+def _hex_id(rng):
+    return '%024x' % rng.getrandbits(96)
+
+
+def _rectangle(lon, lat, width, height):
+    coordinates = [[lon, lat], [lon + width, lat], [lon + width, lat + height], [lon, lat + height], [lon, lat]]
+    return {'coordinates': [coordinates], 'bbox': [lon, lat, lon + width, lat + height], 'type': 'Polygon'}
+
+
+def _anchor(lon, lat):
+    return {'coordinates': [lon, lat], 'type': 'Point'}
+
+
+def _names(prefix, languages):
+    return {f'name@{language}': f'{prefix} ({language})' for language in languages}
+
+
+def generate_solution(locations:int=1000, venues:int=1, buildings_per_venue:int=2, floors_per_building:int=4,
+                      outside_share:float=0.05, languages=LANGUAGES, seed:int=0):
+    """
+    Generates a fake MapsIndoors solution shaped like the Integration API responses.  Used by the benchmarks and the fake server.
+
+    Parameters
+    ----------
+    locations --> number of rooms/areas/pois. venues, buildings and floors come on top of this
+    venues, buildings_per_venue, floors_per_building --> size of the location tree
+    outside_share --> share of the locations placed directly on a venue instead of on a floor
+    languages --> languages used for the name@/description@ properties and category names
+    seed --> same seed gives the same solution
+
+    Returns
+    -------
+
+    dict with the keys 'geodata', 'displaytypes', 'categories' and 'appUserRoles', each holding what the matching endpoint returns.
+
+    examples
+    -------
+
+    generate_solution(10000)
+    generate_solution(100000, venues=5, floors_per_building=10)
+    """
+    rng = random.Random(seed)
+    dataset_id = _hex_id(rng)
+    display_types = [{'id': _hex_id(rng), 'name': name.replace(' ', '_')} for name in DISPLAY_TYPE_NAMES]
+    categories = [{'id': _hex_id(rng), 'key': name.replace(' ', '').lower(), 'name': {language: f'{name} ({language})' for language in languages}}
+                  for name in CATEGORY_NAMES]
+    app_user_roles = [{'id': _hex_id(rng), 'names': [{'language': language, 'name': f'{role} ({language})'} for language in languages]}
+                      for role in ('Staff', 'Visitor', 'Admin')]
+
+    geodata = []
+    floors = []
+    venue_items = []
+    for venue_number in range(venues):
+        # venues are spread out ~1km apart, buildings sit in a row inside the venue
+        venue_lon = 9.95 + 0.015 * venue_number
+        venue_lat = 57.05
+        venue_size = 0.003 * max(1, buildings_per_venue)
+        venue = {'id': _hex_id(rng), 'datasetId': dataset_id, 'externalId': f'V{venue_number}', 'baseType': 'venue',
+                 'geometry': _rectangle(venue_lon, venue_lat, venue_size, venue_size),
+                 'anchor': _anchor(venue_lon + venue_size / 2, venue_lat + venue_size / 2), 'aliases': [], 'status': 3,
+                 'baseTypeProperties': {'defaultfloor': '0', 'administrativeid': f'VENUE{venue_number}', 'graphid': f'VENUE{venue_number}_Graph'},
+                 'properties': _names(f'Venue {venue_number}', languages)}
+        geodata.append(venue)
+        venue_items.append(venue)
+        for building_number in range(buildings_per_venue):
+            building_lon = venue_lon + 0.0005 + 0.003 * building_number
+            building_lat = venue_lat + 0.0005
+            building = {'id': _hex_id(rng), 'parentId': venue['id'], 'datasetId': dataset_id, 'externalId': f'V{venue_number}B{building_number}',
+                        'baseType': 'building', 'geometry': _rectangle(building_lon, building_lat, 0.002, 0.002),
+                        'anchor': _anchor(building_lon + 0.001, building_lat + 0.001), 'aliases': [], 'status': 3,
+                        'baseTypeProperties': {'administrativeid': f'V{venue_number}B{building_number}'},
+                        'properties': _names(f'Building {venue_number}.{building_number}', languages)}
+            geodata.append(building)
+            for floor_number in range(floors_per_building):
+                floor = {'id': _hex_id(rng), 'parentId': building['id'], 'datasetId': dataset_id, 'baseType': 'floor',
+                         'geometry': _rectangle(building_lon, building_lat, 0.002, 0.002), 'status': 3,
+                         'baseTypeProperties': {'administrativeid': str(floor_number * 10), 'name': str(floor_number)},
+                         'properties': _names(f'Floor {floor_number}', languages)}
+                geodata.append(floor)
+                floors.append((floor, building_lon, building_lat))
+
+    outside_count = int(locations * outside_share) if venue_items else 0
+    if venue_items and not floors:
+        outside_count = locations
+    inside_count = locations - outside_count
+    per_floor = math.ceil(inside_count / len(floors)) if floors else 0
+    grid = max(1, math.ceil(math.sqrt(per_floor)))
+    cell = 0.002 / grid
+
+    def make_location(number, parent_id, lon, lat, size):
+        base_type = rng.choices(('room', 'area', 'poi'), weights=(6, 2, 2))[0]
+        if base_type == 'poi':
+            geometry = {'coordinates': [lon + size / 2, lat + size / 2], 'type': 'Point'}
+        else:
+            geometry = _rectangle(lon, lat, size * 0.9, size * 0.9)
+        properties = _names(f'Location {number}', languages)
+        for language in languages:
+            properties[f'description@{language}'] = f'Generated location {number} ({language})'
+        item = {'id': _hex_id(rng), 'parentId': parent_id, 'datasetId': dataset_id, 'externalId': f'L{number}',
+                'baseType': base_type, 'displayTypeId': rng.choice(display_types)['id'], 'geometry': geometry,
+                'anchor': _anchor(lon + size / 2, lat + size / 2),
+                'aliases': [f'A{number}', f'Alias {number % 500}'] if rng.random() < 0.2 else [],
+                'categories': [category['id'] for category in rng.sample(categories, rng.randint(0, 2))],
+                'status': 3 if rng.random() < 0.95 else 1,
+                'baseTypeProperties': {'administrativeid': f'ADM-{number}', 'class': base_type.capitalize(), 'capacity': str(rng.randint(0, 20))},
+                'properties': properties}
+        return item
+
+    number = 0
+    for floor, building_lon, building_lat in floors:
+        for position in range(min(per_floor, inside_count - number)):
+            lon = building_lon + (position % grid) * cell
+            lat = building_lat + (position // grid) * cell
+            geodata.append(make_location(number, floor['id'], lon, lat, cell))
+            number += 1
+    for outside_number in range(outside_count):
+        venue = venue_items[outside_number % len(venue_items)]
+        min_lon, min_lat = venue['geometry']['bbox'][:2]
+        lon = min_lon + rng.random() * 0.0004
+        lat = min_lat + rng.random() * 0.0004
+        geodata.append(make_location(number, venue['id'], lon, lat, 0.00002))
+        number += 1
+
+    return {'geodata': geodata, 'displaytypes': display_types, 'categories': categories, 'appUserRoles': app_user_roles}
@@ -1,8 +1,30 @@
+import os
+
+
+#production endpoints.  MAPSINDOORS_INTEGRATION_URL and MAPSINDOORS_AUTH_URL replace them, e.g. to point at fake_server for load tests.
+INTEGRATION_URL = "https://integration.mapsindoors.com"
+AUTH_URL = "https://auth.mapsindoors.com/connect/token"
+
+
+def get_integration_url():
+    """Integration API root: MAPSINDOORS_INTEGRATION_URL when it's set, otherwise INTEGRATION_URL"""
+    return os.environ.get("MAPSINDOORS_INTEGRATION_URL") or INTEGRATION_URL
+
+
+def get_auth_url():
+    """token endpoint: MAPSINDOORS_AUTH_URL when it's set, otherwise AUTH_URL"""
+    return os.environ.get("MAPSINDOORS_AUTH_URL") or AUTH_URL
+
+
 class Urls:
-    def __init__(self, api_key, response_format="json"):
+    def __init__(self, api_key, response_format="json", integration_url=None):
+        """
+        integration_url: root of the Integration API, e.g. "http://127.0.0.1:8080". defaults to get_integration_url()
+        """
         self.format = response_format
         self.api_key = api_key
-        self.base_url = f"https://integration.mapsindoors.com/{api_key}/api/"
+        self.integration_url = (integration_url or get_integration_url()).rstrip("/")
+        self.base_url = f"{self.integration_url}/{api_key}/api/"
         self.app_user_roles = "appUserRoles"
         self.categories = "categories"
         self.dataset = "dataset"
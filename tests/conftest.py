@@ -0,0 +1,51 @@
+import copy
+import os
+import sys
+
+import pytest
+
+# the repository has no packaging, tests import mapsindoors from the checkout
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapsindoors.geo_functions import GeoFunctions
+from mapsindoors.synthetic import generate_solution
+
+
+API_KEY = 'test'
+
+
+@pytest.fixture
+def solution():
+    return generate_solution(400, venues=2, buildings_per_venue=2, floors_per_building=3, seed=7)
+
+
+def build(solution, geodata=None):
+    """GeoFunctions over the solution, or over geodata with the solution's metadata"""
+    geodata = solution['geodata'] if geodata is None else geodata
+    return GeoFunctions.from_data(API_KEY, copy.deepcopy(geodata), solution['displaytypes'], solution['categories'],
+                                  solution['appUserRoles'])
+
+
+def query_results(geo_functions):
+    """what the public lookups return for every location, independent of row order"""
+    results = {}
+    for item in geo_functions.geodata_response:
+        location_id = item['id']
+        results[location_id] = {
+            'location': geo_functions.get_location(location_id, json=True),
+            'ancestors': [ancestor['id'] for ancestor in geo_functions.get_ancestors(location_id, json=True)],
+            'children': sorted(child['id'] for child in geo_functions.get_child_objects(location_id)),
+            'venue': geo_functions.get_location_venue_id(location_id),
+            'building': geo_functions.get_location_building_id(location_id),
+            'floor': geo_functions.get_location_floor_id(location_id),
+        }
+    by_display_type = {display_type['id']: sorted(location['id'] for location in geo_functions.get_locations_by_display_type_id(display_type['id'], json=True))
+                       for display_type in geo_functions.location_types}
+    by_base_type = {base_type: sorted(geo_functions.filter_locations(base_type=base_type, json=True), key=lambda location: location['id'])
+                    for base_type in ('venue', 'building', 'floor', 'room', 'area', 'poi')}
+    external_ids = {item['externalId'] for item in geo_functions.geodata_response if item.get('externalId')}
+    by_external_id = {external_id: sorted(location['id'] for location in geo_functions.get_location_by_external_id(external_id, json=True))
+                      for external_id in external_ids}
+    aliases = {alias for item in geo_functions.geodata_response for alias in item.get('aliases') or []}
+    by_alias = {alias: sorted(location['id'] for location in geo_functions.get_locations_by_alias(alias, json=True)) for alias in aliases}
+    return results, by_display_type, by_base_type, by_external_id, by_alias
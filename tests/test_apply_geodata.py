@@ -0,0 +1,113 @@
+import copy
+import random
+
+from conftest import build, query_results
+
+
+def change_set(geodata, seed=0):
+    """a new /geodata response with deletes, updates and inserts. returns (geodata, deleted, updated, inserted ids)"""
+    rng = random.Random(seed)
+    geodata = copy.deepcopy(geodata)
+    places = [item for item in geodata if item['baseType'] in ('room', 'area', 'poi')]
+    deleted = {item['id'] for item in rng.sample(places, 20)}
+    updated = set()
+    for item in rng.sample([item for item in places if item['id'] not in deleted], 20):
+        item['properties']['name@en'] = item['properties']['name@en'] + ' (renamed)'
+        item['aliases'] = ['renamed ' + item['id']]
+        updated.add(item['id'])
+    inserted = []
+    for number, template in enumerate(rng.sample(places, 10)):
+        item = copy.deepcopy(template)
+        item['id'] = '%024x' % (number + 1)
+        item['externalId'] = f'inserted-{number}'
+        inserted.append(item)
+    new_geodata = [item for item in geodata if item['id'] not in deleted] + inserted
+    rng.shuffle(new_geodata)
+    return new_geodata, deleted, updated, {item['id'] for item in inserted}
+
+
+def test_apply_geodata_matches_a_fresh_build(solution):
+    geo_functions = build(solution)
+    new_geodata, deleted, updated, inserted = change_set(solution['geodata'])
+
+    changes = geo_functions.apply_geodata(copy.deepcopy(new_geodata))
+
+    assert set(changes['deleted']) == deleted
+    assert set(changes['updated']) == updated
+    assert set(changes['inserted']) == inserted
+    assert changes['unchanged'] == len(new_geodata) - len(updated) - len(inserted)
+    assert query_results(geo_functions) == query_results(build(solution, new_geodata))
+    for location_id in deleted:
+        assert geo_functions.get_location(location_id) is None
+    assert [location['id'] for location in geo_functions.get_location_by_external_id('inserted-0', json=True)] == ['%024x' % 1]
+
+
+def test_apply_geodata_twice_is_a_no_op(solution):
+    geo_functions = build(solution)
+    new_geodata, _, _, _ = change_set(solution['geodata'])
+    geo_functions.apply_geodata(copy.deepcopy(new_geodata))
+
+    changes = geo_functions.apply_geodata(copy.deepcopy(new_geodata))
+
+    assert changes == {'inserted': [], 'updated': [], 'deleted': [], 'unchanged': len(new_geodata)}
+
+
+def index_state(geo_functions):
+    """every index of a GeoFunctions in terms of ids, so two instances with rows in a different order compare equal"""
+    items = geo_functions.geodata_response
+    ids = [item['id'] for item in items]
+
+    def id_of(row):
+        return None if row is None else ids[row]
+
+    assert {location_id: row for location_id, row in geo_functions._row_by_id.items()} == {location_id: row for row, location_id in enumerate(ids)}
+    state = {'ids': sorted(ids)}
+    for name in ('_rows_by_external_id', '_rows_by_alias', '_rows_by_display_type_id', '_rows_by_base_type', '_child_rows'):
+        index = getattr(geo_functions, name)
+        for rows in index.values():
+            # results come back in row order, the lists have to stay sorted
+            assert rows == sorted(rows)
+            assert rows
+        state[name] = {key: sorted(ids[row] for row in rows) for key, rows in index.items()}
+    for name in ('_parent_row', '_venue_row', '_building_row', '_floor_row'):
+        rows = getattr(geo_functions, name)
+        assert len(rows) == len(ids)
+        state[name] = {ids[row]: id_of(value) for row, value in enumerate(rows)}
+    assert len(geo_functions._ancestor_rows) == len(ids)
+    state['_ancestor_rows'] = {ids[row]: [ids[ancestor] for ancestor in ancestors] for row, ancestors in enumerate(geo_functions._ancestor_rows)}
+    return state
+
+
+def test_apply_geodata_indexes_match_a_fresh_build(solution):
+    geo_functions = build(solution)
+    # polygon and nearest caches get built, so the test also covers throwing away the stale ones
+    room = next(item for item in solution['geodata'] if item['baseType'] == 'room')
+    geo_functions.get_areas_within_radius(room['id'], 20)
+    geo_functions.nearest(room['id'], k=3, same_floor=False)
+
+    new_geodata, _, _, _ = change_set(solution['geodata'], seed=1)
+    floors = [item for item in new_geodata if item['baseType'] == 'floor']
+    buildings = [item for item in new_geodata if item['baseType'] == 'building']
+    # a room moves to a floor in another building, and a whole floor (with everything on it) moves to another building
+    moved_room = next(item for item in new_geodata if item['baseType'] == 'room' and item['parentId'] != floors[-1]['id'])
+    moved_room['parentId'] = floors[-1]['id']
+    moved_floor = next(floor for floor in floors if floor['parentId'] != buildings[-1]['id'])
+    moved_floor['parentId'] = buildings[-1]['id']
+    # and a parent disappears, its children are left without one
+    deleted_floor = next(floor for floor in floors if floor is not moved_floor and floor is not floors[-1])
+    new_geodata = [item for item in new_geodata if item is not deleted_floor]
+
+    changes = geo_functions.apply_geodata(copy.deepcopy(new_geodata))
+    fresh = build(solution, new_geodata)
+
+    assert moved_room['id'] in changes['updated'] and moved_floor['id'] in changes['updated']
+    assert deleted_floor['id'] in changes['deleted']
+    assert index_state(geo_functions) == index_state(fresh)
+    assert query_results(geo_functions) == query_results(fresh)
+    assert geo_functions.get_location_building_id(moved_room['id']) == floors[-1]['parentId']
+    on_moved_floor = next(item['id'] for item in new_geodata if item.get('parentId') == moved_floor['id'])
+    assert geo_functions.get_location_building_id(on_moved_floor) == buildings[-1]['id']
+    # results come in row order, which differs between the two
+    assert sorted(geo_functions.get_areas_within_radius(moved_room['id'], 20)) == sorted(fresh.get_areas_within_radius(moved_room['id'], 20))
+    assert [location.id for location in geo_functions.nearest(moved_room['id'], k=5)] == \
+           [location.id for location in fresh.nearest(moved_room['id'], k=5)]
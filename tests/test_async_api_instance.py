@@ -0,0 +1,42 @@
+import asyncio
+import copy
+from unittest import mock
+
+import aiohttp
+import pytest
+
+from conftest import build, query_results
+from mapsindoors.async_api_instance import AsyncGeoFunctions
+from mapsindoors.fake_server import FakeIntegrationServer
+from mapsindoors.rate_limit import ApiScheduler
+
+
+@pytest.fixture
+def server(solution):
+    with FakeIntegrationServer(solution=copy.deepcopy(solution)) as server:
+        yield server
+
+
+def test_create_many_shares_one_session(solution, server):
+    sessions = []
+    original_init = aiohttp.ClientSession.__init__
+
+    def counting_init(session, *args, **kwargs):
+        sessions.append(session)
+        original_init(session, *args, **kwargs)
+
+    with mock.patch.object(aiohttp.ClientSession, '__init__', counting_init):
+        results = asyncio.run(AsyncGeoFunctions.create_many(['a', 'b', 'c'], integration_url=server.url, scheduler=ApiScheduler()))
+
+    assert len(sessions) == 1
+    assert sessions[0].closed
+    expected = query_results(build(solution))
+    for geo_functions in results.values():
+        assert query_results(geo_functions) == expected
+
+
+def test_create_streamed_matches_a_normal_load(solution, server):
+    geo_functions = asyncio.run(AsyncGeoFunctions.create('a', stream=True, integration_url=server.url, scheduler=ApiScheduler()))
+
+    assert query_results(geo_functions) == query_results(build(solution))
+    assert geo_functions.instance.url.geodata_url().startswith(server.url)
@@ -0,0 +1,96 @@
+import copy
+
+import pytest
+
+from mapsindoors.auth_client import OAuthToken
+from mapsindoors.bulk_writer import BulkWriter
+from mapsindoors.fake_server import FakeIntegrationServer
+from mapsindoors.rate_limit import ApiScheduler
+
+
+@pytest.fixture
+def server(solution):
+    with FakeIntegrationServer(solution=copy.deepcopy(solution), retry_after=0) as server:
+        yield server
+
+
+def make_writer(server, **kwargs):
+    token = OAuthToken('user', 'password', 'test', auth_url=server.auth_url, integration_url=server.url)
+    scheduler = ApiScheduler(rate=1000, burst=1000, max_retries=2, backoff=0.001, max_backoff=0.01)
+    return BulkWriter(token, chunk_size=7, max_workers=3, backoff=0.001, max_backoff=0.01, scheduler=scheduler, **kwargs)
+
+
+def served(server):
+    return {item['id']: item for item in server.solution['geodata']}
+
+
+def test_update_create_and_delete(server):
+    progress = []
+    writer = make_writer(server, progress=lambda result, done, total: progress.append((done, total)))
+    changed = [dict(item, externalId='changed') for item in server.solution['geodata'][:30]]
+
+    summary = writer.update_geodata(changed)
+
+    assert summary['total'] == summary['succeeded'] == 30
+    assert summary['failed'] == []
+    assert [result['index'] for result in summary['results']] == list(range(30))
+    assert progress == [(done, 30) for done in range(1, 31)]
+    assert all(served(server)[item['id']]['externalId'] == 'changed' for item in changed)
+
+    created = writer.create_geodata([{'baseType': 'poi', 'externalId': f'new-{number}'} for number in range(10)])
+    new_ids = [result['response'] for result in created['results']]
+    assert created['succeeded'] == 10
+    assert all(new_id in served(server) for new_id in new_ids)
+
+    deleted = writer.delete_geodata(new_ids[:4])
+    assert deleted['succeeded'] == 4
+    assert not set(new_ids[:4]) & set(served(server))
+    assert set(new_ids[4:]) <= set(served(server))
+
+
+def test_rejected_items_are_found_by_splitting_chunks(server):
+    items = copy.deepcopy(server.solution['geodata'][:20])
+    server.reject_ids = {items[3]['id'], items[15]['id']}
+    writer = make_writer(server)
+
+    summary = writer.update_geodata([dict(item, externalId='changed') for item in items])
+
+    assert [result['index'] for result in summary['failed']] == [3, 15]
+    assert all(result['status'] == 400 for result in summary['failed'])
+    assert summary['succeeded'] == 18
+    assert served(server)[items[3]['id']].get('externalId') == items[3].get('externalId')
+    assert served(server)[items[4]['id']]['externalId'] == 'changed'
+
+
+def test_expired_token_is_refreshed_once(server):
+    writer = make_writer(server)
+    server.expire_tokens()
+
+    summary = writer.update_geodata(copy.deepcopy(server.solution['geodata'][:21]))
+
+    assert summary['succeeded'] == 21
+    # the three chunks that got a 401 at the same time share one new token
+    assert writer.token.provider.metrics()['fetches'] == 2
+
+
+def test_failed_login_fails_the_chunk_instead_of_the_write(server):
+    writer = make_writer(server, max_retries=1)
+    server.expire_tokens()
+    # nothing listens there, so logging in again fails
+    writer.token.provider.auth_url = 'http://127.0.0.1:9/connect/token'
+
+    summary = writer.update_geodata(copy.deepcopy(server.solution['geodata'][:10]))
+
+    assert summary['succeeded'] == 0
+    assert [result['status'] for result in summary['failed']] == [401] * 10
+
+
+def test_throttled_chunks_are_not_retried_on_top_of_the_scheduler(server):
+    writer = make_writer(server)
+    server.throttle_rate = 1.0
+
+    summary = writer.update_geodata(copy.deepcopy(server.solution['geodata'][:7]))
+
+    assert [result['status'] for result in summary['failed']] == [429] * 7
+    # one chunk: the first send and the scheduler's two retries
+    assert server.stats()['by_status']['429'] == 3
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from conftest import build, query_results
+from mapsindoors.geo_functions import GeoFunctions
+
+
+def test_save_and_from_file_round_trip(solution, tmp_path):
+    loaded = build(solution)
+    path = str(tmp_path / 'solution.migd')
+    loaded.save(path)
+    mapped = GeoFunctions.from_file('test', path)
+
+    assert len(mapped.store) == len(loaded.store)
+    assert list(mapped.geodata_response) == list(loaded.geodata_response)
+    assert query_results(mapped) == query_results(loaded)
+    for name in ('base_type', 'status', 'display_type', 'parent'):
+        assert np.array_equal(getattr(mapped.store, name), getattr(loaded.store, name))
+    assert np.array_equal(mapped.store.anchors, loaded.store.anchors, equal_nan=True)
+    assert np.array_equal(mapped.store.bbox, loaded.store.bbox, equal_nan=True)
+    assert mapped.location_types == loaded.location_types
+    assert mapped.categories == loaded.categories
+    assert mapped.app_user_roles == loaded.app_user_roles
+
+
+def test_status_values_above_int8_survive(solution, tmp_path):
+    geodata = [dict(item) for item in solution['geodata']]
+    geodata[-1]['status'] = 300
+    loaded = build(solution, geodata)
+    assert loaded.store.status[-1] == 300
+    assert loaded.store.filter_rows(status=300).tolist() == [len(geodata) - 1]
+    path = str(tmp_path / 'solution.migd')
+    loaded.save(path)
+    assert GeoFunctions.from_file('test', path).store.status[-1] == 300
+
+
+def test_mapped_queries_match(solution, tmp_path):
+    loaded = build(solution)
+    path = str(tmp_path / 'solution.migd')
+    loaded.save(path)
+    mapped = GeoFunctions.from_file('test', path)
+
+    room = next(item['id'] for item in solution['geodata'] if item['baseType'] == 'room')
+    within_radius = loaded.get_areas_within_radius(room, 15)
+    assert within_radius
+    assert mapped.get_areas_within_radius(room, 15) == within_radius
+    assert [location.id for location in mapped.nearest(room, k=5, same_floor=False)] == \
+           [location.id for location in loaded.nearest(room, k=5, same_floor=False)]
+    assert mapped.get_location('missing') is None
+
+
+def test_mapped_store_is_read_only(solution, tmp_path):
+    loaded = build(solution)
+    path = str(tmp_path / 'solution.migd')
+    loaded.save(path)
+    mapped = GeoFunctions.from_file('test', path)
+
+    with pytest.raises(TypeError):
+        mapped.apply_geodata(solution['geodata'])
+    with pytest.raises(TypeError):
+        mapped.store.append(solution['geodata'][0])
@@ -0,0 +1,15 @@
+import mapsindoors.geo_functions as geo_functions
+
+from conftest import build
+
+
+def test_polygon_tree_matches_the_bbox_scan(solution, monkeypatch):
+    """parents big enough for an STRtree find the same rooms/areas as the vectorized bbox scan"""
+    places = [item['id'] for item in solution['geodata'] if item['baseType'] in ('room', 'area', 'poi')]
+    linear = build(solution)
+    expected = [linear.get_areas_within_radius(location_id, 15) for location_id in places]
+    monkeypatch.setattr(geo_functions, 'POLYGON_TREE_MIN_ROWS', 1)
+    tree = build(solution)
+    assert [tree.get_areas_within_radius(location_id, 15) for location_id in places] == expected
+    assert any(index[3] is not None for index in tree._polygon_index.values())
+    assert sum(map(len, expected)) > 0
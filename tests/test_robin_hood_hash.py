@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+from mapsindoors.robin_hood_hash import EMPTY, HashMap
+
+
+def check_invariants(hash_map):
+    """every element sits probe_length slots after its home slot, and no element is further from home than the next one plus one"""
+    live = 0
+    for index in range(hash_map.size):
+        probe_length = hash_map.probe_list[index]
+        if probe_length == EMPTY:
+            continue
+        live += 1
+        assert (hash_map.hash_list[index] & hash_map.mask) == (index - probe_length) % hash_map.size
+        next_probe_length = hash_map.probe_list[(index + 1) & hash_map.mask]
+        assert next_probe_length <= probe_length + 1
+    assert live == len(hash_map)
+    assert hash_map.load() <= hash_map.max_load
+
+
+class CollidingKey:
+    """key with a chosen hash, so long probe chains and wrap around can be tested"""
+    def __init__(self, name, key_hash):
+        self.name = name
+        self.key_hash = key_hash
+
+    def __hash__(self):
+        return self.key_hash
+
+    def __eq__(self, other):
+        return isinstance(other, CollidingKey) and self.name == other.name
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_matches_dict_under_mixed_operations(seed):
+    rng = random.Random(seed)
+    keys = ['%024x' % rng.getrandbits(96) for _ in range(300)]
+    hash_map = HashMap()
+    expected = {}
+    for step in range(5000):
+        key = rng.choice(keys)
+        draw = rng.random()
+        if draw < 0.45:
+            value = rng.random()
+            assert hash_map.set(key, value) is True
+            expected[key] = value
+        elif draw < 0.75:
+            assert hash_map.delete(key) == expected.pop(key, None)
+        else:
+            assert hash_map.get(key) == expected.get(key)
+        assert len(hash_map) == len(expected)
+        if step % 500 == 0:
+            check_invariants(hash_map)
+    check_invariants(hash_map)
+    assert dict(hash_map.items()) == expected
+    assert set(hash_map) == set(expected)
+    for key in keys:
+        assert (key in hash_map) == (key in expected)
+
+
+def test_colliding_keys_wrap_around_and_backward_shift():
+    hash_map = HashMap(8)
+    size = hash_map.size
+    # every key has the last slot as home, so the chain wraps around to the start of the table
+    keys = [CollidingKey(f'key{number}', size - 1) for number in range(5)]
+    for number, key in enumerate(keys):
+        hash_map[key] = number
+    check_invariants(hash_map)
+    del hash_map[keys[1]]
+    check_invariants(hash_map)
+    assert keys[1] not in hash_map
+    assert [hash_map[key] for key in keys if key is not keys[1]] == [0, 2, 3, 4]
+    with pytest.raises(KeyError):
+        hash_map[keys[1]]
+    with pytest.raises(KeyError):
+        del hash_map[keys[1]]
+
+
+def test_grows_and_keeps_every_item():
+    hash_map = HashMap(2)
+    for number in range(1000):
+        hash_map.set(str(number), number)
+    check_invariants(hash_map)
+    assert all(hash_map.get(str(number)) == number for number in range(1000))
+    assert hash_map.get('missing', 'default') == 'default'
+
+
+def test_update_does_not_add_an_item():
+    hash_map = HashMap()
+    hash_map.set('a', 1)
+    hash_map.set('a', 2)
+    assert len(hash_map) == 1
+    assert hash_map.get('a') == 2
+
+
+def test_from_items_keeps_the_last_value():
+    hash_map = HashMap.from_items([('a', 1), ('b', 2), ('a', 3)])
+    assert dict(hash_map.items()) == {'a': 3, 'b': 2}
+    assert dict(HashMap.from_items({'x': 1}).items()) == {'x': 1}
+    check_invariants(hash_map)
+
+
+def test_clear():
+    hash_map = HashMap.from_items((str(number), number) for number in range(100))
+    hash_map.clear()
+    assert len(hash_map) == 0
+    assert hash_map.get('1') is None
+    hash_map.set('1', 1)
+    assert hash_map['1'] == 1
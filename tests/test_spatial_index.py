@@ -0,0 +1,34 @@
+import numpy as np
+
+from mapsindoors.spatial_index import PointIndex, unit_vectors
+
+
+def brute_force(lon, lat, query_lon, query_lat, k):
+    """closest k positions by squared chord, ties by position"""
+    distances = ((unit_vectors(lon, lat) - unit_vectors(np.array([query_lon]), np.array([query_lat])))**2).sum(axis=0)
+    order = np.lexsort((np.arange(len(lon)), distances))[:k]
+    return order, distances[order] / 4
+
+
+def test_query_matches_brute_force():
+    rng = np.random.default_rng(0)
+    lon, lat = rng.uniform(-np.pi, np.pi, 2000), rng.uniform(-np.pi / 2, np.pi / 2, 2000)
+    index = PointIndex(lon, lat, leaf_size=16)
+    for query_lon, query_lat in zip(rng.uniform(-np.pi, np.pi, 50), rng.uniform(-np.pi / 2, np.pi / 2, 50)):
+        positions, distances = index.query(query_lon, query_lat, 10)
+        expected_positions, expected_distances = brute_force(lon, lat, query_lon, query_lat, 10)
+        assert positions.tolist() == expected_positions.tolist()
+        assert np.allclose(distances, expected_distances)
+
+
+def test_ties_at_the_k_boundary_keep_the_lowest_positions():
+    # a few distinct places, each repeated many times and spread over several leaves
+    rng = np.random.default_rng(1)
+    places = rng.uniform(-0.01, 0.01, (5, 2))
+    repeated = places[rng.integers(0, len(places), 500)]
+    lon, lat = repeated[:, 0], repeated[:, 1]
+    index = PointIndex(lon, lat, leaf_size=8)
+    for query_lon, query_lat in places:
+        for k in (1, 7, 40, 150):
+            positions, _ = index.query(query_lon, query_lat, k)
+            assert positions.tolist() == brute_force(lon, lat, query_lon, query_lat, k)[0].tolist()